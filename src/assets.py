@@ -0,0 +1,199 @@
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from compress import gzip_variant, has_variant, should_compress
+from copystatic import copy_file, copy_png_recompressed
+from manifest import atomic_write, hash_bytes, hash_file
+from progress import Progress
+
+
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+FINGERPRINT_LENGTH = 8
+
+
+class AssetMap:
+    """Static files published under content-addressed names.
+
+    `urls` maps each site-absolute URL of a static file, such as
+    "/images/tolkien.png", to its fingerprinted URL, such as
+    "/images/tolkien.972a62d2.png". Byte-identical files share one
+    fingerprinted file, named after the first of them in path order.
+    `files` maps each published path, relative to the output directory, to
+    the source file to copy, or to the bytes to write for stylesheets whose
+    references were rewritten. Dotfiles are published under their own
+    names and are not in `urls`.
+    """
+
+    def __init__(self, urls, files):
+        self.urls = urls
+        self.files = files
+        mapping = "\n".join(f"{url} {urls[url]}" for url in sorted(urls))
+        self.digest = hash_bytes(mapping.encode("utf-8"))
+
+    def resolve(self, url):
+        path, sep, rest = _split_url(url)
+        fingerprinted = self.urls.get(path)
+        if fingerprinted is None:
+            return url
+        return fingerprinted + sep + rest
+
+
+def build_asset_map(source_dir_path):
+    sources = []
+    for dir_path, dir_names, file_names in os.walk(source_dir_path):
+        dir_names.sort()
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            rel_path = os.path.relpath(path, source_dir_path).replace(os.sep, "/")
+            sources.append((rel_path, path))
+    sources.sort()
+
+    urls = {}
+    files = {}
+    published = {}
+    stylesheets = []
+    for rel_path, path in sources:
+        if posixpath.basename(rel_path).startswith("."):
+            files[rel_path] = path
+        elif rel_path.endswith(".css"):
+            stylesheets.append((rel_path, path))
+        else:
+            digest = hash_file(path)
+            if digest not in published:
+                published[digest] = fingerprint(rel_path, digest)
+                files[published[digest]] = path
+            urls["/" + rel_path] = "/" + published[digest]
+
+    # Stylesheets are fingerprinted after their url() references have been
+    # rewritten, so a changed image also changes the name of the CSS that
+    # uses it. References between stylesheets are not rewritten.
+    for rel_path, path in stylesheets:
+        with open(path, "r") as f:
+            css = rewrite_css(f.read(), rel_path, urls)
+        data = css.encode("utf-8")
+        digest = hash_bytes(data)
+        if digest not in published:
+            published[digest] = fingerprint(rel_path, digest)
+            files[published[digest]] = data
+        urls["/" + rel_path] = "/" + published[digest]
+    return AssetMap(urls, files)
+
+
+def fingerprint(rel_path, digest):
+    root, ext = posixpath.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def rewrite_css(css, rel_path, urls):
+    css_dir = posixpath.dirname("/" + rel_path)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2)
+        if "://" in url or url.startswith(("data:", "#", "//")):
+            return match.group(0)
+        path, sep, rest = _split_url(url)
+        target = posixpath.normpath(posixpath.join(css_dir, path))
+        fingerprinted = urls.get(target)
+        if fingerprinted is None:
+            return match.group(0)
+        if not url.startswith("/"):
+            # Relative references stay relative, so the stylesheet works
+            # under any basepath.
+            fingerprinted = posixpath.relpath(fingerprinted, css_dir)
+        return f"url({quote}{fingerprinted}{sep}{rest}{quote})"
+
+    return CSS_URL_PATTERN.sub(replace, css)
+
+
+def publish_assets(
+    assets,
+    dest_dir_path,
+    manifest=None,
+    quiet=False,
+    gzip_level=None,
+    recompress_pngs=False,
+    routes=None,
+):
+    """Write the asset map's files into dest_dir_path.
+
+    A fingerprinted file that already exists has the right contents, so
+    only missing files are written. With `gzip_level`, written files and
+    files missing a .gz variant at that level are compressed on a thread
+    pool. With `routes`, a RouteIndex, every published file is added to
+    it, under its original URL as well. Returns the list of written paths.
+    """
+    written = []
+    to_compress = []
+    if routes is not None:
+        for url, fingerprinted in assets.urls.items():
+            routes.add_url(url, fingerprinted[1:])
+    for rel_path, source in sorted(assets.files.items()):
+        dest_path = os.path.join(dest_dir_path, *rel_path.split("/"))
+        is_png = isinstance(source, str) and source.endswith(".png")
+        recompress = is_png and recompress_pngs
+        signature = rel_path + (":recompressed" if recompress else "")
+        source_key = source if isinstance(source, str) else rel_path
+        published = _is_published(source, dest_path)
+        if published and is_png and manifest is not None:
+            # The name doesn't tell whether the last build recompressed it.
+            published = manifest.is_fresh("static", source_key, signature, dest_path)
+        if manifest is not None:
+            manifest.record("static", source_key, signature, dest_path)
+        if routes is not None:
+            routes.add_url("/" + rel_path, rel_path)
+        if published:
+            if (
+                gzip_level is not None
+                and should_compress(dest_path)
+                and not has_variant(dest_path, gzip_level)
+            ):
+                to_compress.append(dest_path)
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if recompress:
+            copy_png_recompressed(source, dest_path)
+        elif isinstance(source, str):
+            copy_file(source, dest_path)
+        else:
+            with atomic_write(dest_path, "wb") as f:
+                f.write(source)
+        written.append(dest_path)
+    if gzip_level is not None:
+        to_compress.extend(written)
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(gzip_variant, dest_path, gzip_level)
+                for dest_path in to_compress
+            ]
+            for future in futures:
+                future.result()
+    progress = Progress("assets", len(written), quiet)
+    for dest_path in written:
+        progress.advance(f" * {dest_path}")
+    progress.finish()
+    return written
+
+
+def _is_published(source, dest_path):
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if not isinstance(source, str) or not os.path.basename(source).startswith("."):
+        # The name carries the hash of the contents.
+        return True
+    source_stat = os.stat(source)
+    return (dest_stat.st_size, dest_stat.st_mtime_ns) == (
+        source_stat.st_size,
+        source_stat.st_mtime_ns,
+    )
+
+
+def _split_url(url):
+    # Splits off the query string or fragment, which don't name the file.
+    for i, char in enumerate(url):
+        if char in "?#":
+            return url[:i], char, url[i + 1 :]
+    return url, "", ""
@@ -0,0 +1,96 @@
+"""Compare HTML serializers on large synthetic documents.
+
+Run from src/:  python3 -m benchmarks.bench_htmlnode [nodes]
+"""
+import io
+import sys
+import time
+
+from htmlnode import LeafNode, ParentNode
+
+
+def legacy_to_html(node):
+    # ParentNode.to_html as it was before iter_html: recursive, building the
+    # children with repeated +=.
+    if isinstance(node, LeafNode):
+        return node.to_html()
+    children_html = ""
+    for child in node.children:
+        children_html += legacy_to_html(child)
+    return f"<{node.tag}{node.props_to_html()}>{children_html}</{node.tag}>"
+
+
+def wide_document(nodes):
+    # One <p> per 10 nodes, each holding text, bold and link leaves.
+    paragraphs = []
+    for i in range(nodes // 10):
+        children = []
+        for j in range(3):
+            children.append(LeafNode(None, f"paragraph {i} sentence {j} "))
+            children.append(LeafNode("b", "bold"))
+            children.append(LeafNode("a", "link", {"href": f"/page/{i}/{j}"}))
+        paragraphs.append(ParentNode("p", children))
+    return ParentNode("div", paragraphs)
+
+
+def nested_document(nodes, fanout=4):
+    # A balanced tree of <section>s with the leaves at the bottom, so every
+    # byte of output sits log(nodes, fanout) levels deep.
+    level = [LeafNode("a", f"item {i}", {"href": f"/item/{i}"}) for i in range(nodes // 2)]
+    while len(level) > 1:
+        level = [
+            ParentNode("section", level[i : i + fanout])
+            for i in range(0, len(level), fanout)
+        ]
+    return level[0]
+
+
+def deep_document(depth):
+    node = LeafNode(None, "bottom")
+    for _ in range(depth):
+        node = ParentNode("div", [node])
+    return node
+
+
+def best_of(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def compare(name, document, nodes):
+    expected = legacy_to_html(document)
+    assert document.to_html() == expected
+    results = {
+        "legacy to_html": best_of(lambda: legacy_to_html(document)),
+        "to_html": best_of(document.to_html),
+        "write_html": best_of(lambda: document.write_html(io.StringIO())),
+    }
+    print(f"{name} document, {nodes} nodes, {len(expected)} bytes")
+    for label, elapsed in results.items():
+        print(f"  {label:<16} {elapsed * 1000:8.1f} ms")
+
+
+def main(nodes=100_000):
+    compare("wide", wide_document(nodes), nodes)
+    compare("nested", nested_document(nodes), nodes)
+
+    deep = deep_document(nodes)
+    try:
+        legacy_to_html(deep)
+        legacy = "ok"
+    except RecursionError:
+        legacy = "RecursionError"
+    elapsed = best_of(lambda: deep.write_html(io.StringIO()))
+    print(f"deep document, {nodes} levels")
+    print(f"  {'legacy to_html':<16} {legacy}")
+    print(f"  {'write_html':<16} {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
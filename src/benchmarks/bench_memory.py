@@ -0,0 +1,44 @@
+"""Measure the memory held by the node trees of one large page.
+
+Run from src/:  python3 -m benchmarks.bench_memory [paragraphs]
+"""
+import sys
+import tracemalloc
+
+from inline_markdown import text_to_textnodes
+from markdown_blocks import markdown_to_html_node
+
+
+def large_page(paragraphs):
+    blocks = ["# A large page"]
+    for i in range(paragraphs):
+        blocks.append(
+            f"Paragraph {i} has **bold**, _italic_ and `code`, a "
+            f"[link to {i}](/pages/{i}) and an ![image {i}](/images/{i}.png)."
+        )
+        if i % 10 == 0:
+            blocks.append("\n".join(f"- item [{j}](/items/{j})" for j in range(5)))
+    return "\n\n".join(blocks)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main(paragraphs=20_000):
+    markdown = large_page(paragraphs)
+    text = " ".join(markdown.split("\n\n")[1:1000])
+    nodes, text_current, _ = measure(text_to_textnodes, text)
+    tree, tree_current, tree_peak = measure(markdown_to_html_node, markdown)
+    print(f"page: {paragraphs} paragraphs, {len(markdown)} bytes of markdown")
+    print(f"  TextNodes       {text_current / len(nodes):8.1f} bytes/node")
+    print(f"  HTML tree       {tree_current / 2**20:8.1f} MiB held")
+    print(f"  HTML tree peak  {tree_peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,149 @@
+"""Deterministic generator for synthetic content trees.
+
+The tree has the same layout as the repository (content/, static/ and
+template.html), so main() can build it unchanged.
+"""
+import os
+import random
+import struct
+import zlib
+
+
+WORDS = (
+    "the ring of power was forged in the fires of mount doom by sauron "
+    "while elves dwarves and men received lesser rings and the shire slept"
+).split()
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+
+<head>
+    <meta charset="utf-8">
+    <title> {{ Title }} </title>
+    <link href="/index.css" rel="stylesheet">
+</head>
+
+<body>
+    <article>
+        {{ Content }}
+    </article>
+</body>
+
+</html>
+"""
+
+
+class CorpusShape:
+    def __init__(
+        self,
+        pages=1000,
+        paragraphs=12,
+        paragraph_words=80,
+        link_density=0.04,
+        image_density=0.2,
+        code_lines=8,
+        depth=3,
+        fanout=10,
+        images=8,
+        seed=0,
+    ):
+        self.pages = pages
+        self.paragraphs = paragraphs
+        self.paragraph_words = paragraph_words
+        self.link_density = link_density
+        self.image_density = image_density
+        self.code_lines = code_lines
+        self.depth = depth
+        self.fanout = fanout
+        self.images = images
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def generate_corpus(root, shape):
+    rng = random.Random(shape.seed)
+    routes = [page_route(i, shape) for i in range(shape.pages)]
+
+    static_dir = os.path.join(root, "static")
+    os.makedirs(os.path.join(static_dir, "images"), exist_ok=True)
+    with open(os.path.join(static_dir, "index.css"), "w") as f:
+        f.write("body { font-family: serif; }\n")
+    for i in range(shape.images):
+        with open(os.path.join(static_dir, "images", f"{i}.png"), "wb") as f:
+            f.write(tiny_png(i + 1, i + 1))
+    with open(os.path.join(root, "template.html"), "w") as f:
+        f.write(TEMPLATE)
+
+    for i, route in enumerate(routes):
+        path = os.path.join(root, "content", route.strip("/"), "index.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(page_markdown(i, rng, routes, shape))
+    return routes
+
+
+def page_route(i, shape):
+    parts = []
+    n = i
+    for _ in range(shape.depth - 1):
+        parts.append(f"d{n % shape.fanout}")
+        n //= shape.fanout
+    parts.append(f"page{i}")
+    return "/" + "/".join(parts)
+
+
+def page_markdown(i, rng, routes, shape):
+    blocks = [f"# Page {i}"]
+    for p in range(shape.paragraphs):
+        kind = p % 6
+        if kind == 2:
+            blocks.append("\n".join(f"- {sentence(rng, routes, shape, 8)}" for _ in range(4)))
+        elif kind == 3:
+            blocks.append(f"## Section {p}")
+        elif kind == 4 and shape.code_lines > 0:
+            lines = [f"line {n} = {rng.choice(WORDS)}" for n in range(shape.code_lines)]
+            blocks.append("```\n" + "\n".join(lines) + "\n```")
+        elif kind == 5:
+            blocks.append("> " + sentence(rng, routes, shape, 12))
+        else:
+            text = sentence(rng, routes, shape, shape.paragraph_words)
+            if rng.random() < shape.image_density:
+                image = rng.randrange(max(shape.images, 1))
+                text += f" ![figure {image}](/images/{image}.png)"
+            blocks.append(text)
+    return "\n\n".join(blocks) + "\n"
+
+
+def sentence(rng, routes, shape, words):
+    out = []
+    for n in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < shape.link_density:
+            out.append(f"[{word}]({rng.choice(routes)})")
+        elif roll < shape.link_density + 0.03:
+            out.append(f"**{word}**")
+        elif roll < shape.link_density + 0.05:
+            out.append(f"_{word}_")
+        elif roll < shape.link_density + 0.06:
+            out.append(f"`{word}`")
+        else:
+            out.append(word)
+    return " ".join(out)
+
+
+def tiny_png(width, height):
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    rows = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
@@ -0,0 +1,217 @@
+"""Time each build stage and whole builds on synthetic corpora.
+
+Run from src/:
+    python3 -m benchmarks.run --sizes 1000 10000 100000 --output results.json
+    python3 -m benchmarks.run --sizes 1000 --compare results.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import CorpusShape, generate_corpus
+from gencontent import discover_pages, extract_title
+from inline_markdown import set_inline_parser, text_to_textnodes
+from markdown_blocks import (
+    BlockType,
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+from template import load_template
+
+
+# CorpusShape fields settable from the command line, besides pages and seed.
+SHAPE_OPTIONS = (
+    ("paragraphs", int),
+    ("paragraph_words", int),
+    ("link_density", float),
+    ("image_density", float),
+    ("code_lines", int),
+    ("depth", int),
+    ("fanout", int),
+    ("images", int),
+)
+
+STAGES = (
+    "read",
+    "markdown_to_blocks",
+    "block_to_block_type",
+    "text_to_textnodes",
+    "markdown_to_html_node",
+    "to_html",
+    "template_fill",
+    "write",
+)
+
+
+def time_stages(root):
+    """Run every page of the corpus at `root` through each stage in turn."""
+    content_dir = os.path.join(root, "content")
+    out_dir = os.path.join(root, "stages-out")
+    template = load_template(os.path.join(root, "template.html"), "/")
+    totals = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+
+    for from_path, dest_path in discover_pages(content_dir, out_dir):
+        t0 = clock()
+        with open(from_path, "r") as f:
+            markdown = f.read()
+        t1 = clock()
+        blocks = markdown_to_blocks(markdown)
+        t2 = clock()
+        block_types = [block_to_block_type(block) for block in blocks]
+        t3 = clock()
+        for block, block_type in zip(blocks, block_types):
+            if block_type != BlockType.CODE:
+                text_to_textnodes(" ".join(block.split("\n")))
+        t4 = clock()
+        node = markdown_to_html_node(markdown)
+        t5 = clock()
+        html = node.to_html()
+        t6 = clock()
+        page = template.render(Title=extract_title(markdown), Content=html)
+        t7 = clock()
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        with open(dest_path, "w") as f:
+            f.write(page)
+        t8 = clock()
+
+        for stage, start, end in zip(
+            STAGES, (t0, t1, t2, t3, t4, t5, t6, t7), (t1, t2, t3, t4, t5, t6, t7, t8)
+        ):
+            totals[stage] += end - start
+    return totals
+
+
+def time_build(root, build_args):
+    # main.py works on paths relative to the current directory.
+    import main as build
+
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            build.main(build_args)
+            return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+
+def run(args):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "inline_parser": args.inline_parser,
+        "backend": args.backend,
+        "shape": None,
+        "stages": {},
+        "builds": [],
+    }
+    set_inline_parser(args.inline_parser)
+    shape_args = {name: getattr(args, name) for name, _ in SHAPE_OPTIONS}
+    shape_args["seed"] = args.seed
+    results["shape"] = CorpusShape(**shape_args).to_dict()
+    del results["shape"]["pages"]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ssg-bench-")
+    try:
+        for pages in sorted(set(args.sizes + [args.stage_pages])):
+            shape = CorpusShape(pages=pages, **shape_args)
+            # Corpora kept in --workdir are only reused for the same shape.
+            listing = json.dumps(shape.to_dict(), sort_keys=True).encode("utf-8")
+            digest = hashlib.sha256(listing).hexdigest()[:8]
+            root = os.path.join(workdir, f"corpus-{pages}-{digest}")
+            if not os.path.exists(root):
+                generate_corpus(root, shape)
+
+            if pages == args.stage_pages:
+                results["stages"] = {"pages": pages, "seconds": time_stages(root)}
+                print(f"stages on {pages} pages:")
+                for stage, seconds in results["stages"]["seconds"].items():
+                    print(f"  {stage:<22} {seconds * 1000:10.1f} ms")
+
+            if pages not in args.sizes:
+                continue
+            build_args = ["/", "--jobs", str(args.jobs), "--backend", args.backend]
+            seconds = time_build(root, build_args)
+            noop = None
+            if args.backend == "native":
+                # The first incremental build writes the manifest, the second
+                # one is the no-op rebuild we want to time.
+                time_build(root, build_args + ["--incremental"])
+                noop = time_build(root, build_args + ["--incremental"])
+            results["builds"].append(
+                {
+                    "pages": pages,
+                    "jobs": args.jobs,
+                    "seconds": seconds,
+                    "pages_per_second": pages / seconds,
+                    "incremental_noop_seconds": noop,
+                }
+            )
+            line = f"build {pages:>7} pages: {seconds:8.2f} s ({pages / seconds:8.0f} pages/s)"
+            if noop is not None:
+                line += f", no-op incremental {noop:6.2f} s"
+            print(line)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), results)
+    return results
+
+
+def compare(old, new):
+    print(f"compared with {old['timestamp']}:")
+    old_stages = old.get("stages", {}).get("seconds", {})
+    for stage, seconds in new.get("stages", {}).get("seconds", {}).items():
+        if old_stages.get(stage):
+            print(f"  {stage:<22} {seconds / old_stages[stage]:6.2f}x")
+    old_builds = {build["pages"]: build for build in old.get("builds", [])}
+    for build in new["builds"]:
+        previous = old_builds.get(build["pages"])
+        if previous:
+            ratio = build["seconds"] / previous["seconds"]
+            print(f"  build {build['pages']:>7} pages    {ratio:6.2f}x")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--stage-pages", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    defaults = CorpusShape()
+    for name, type_ in SHAPE_OPTIONS:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=type_,
+            default=getattr(defaults, name),
+            help=f"corpus shape (default {getattr(defaults, name)})",
+        )
+    parser.add_argument("--inline-parser", choices=("scan", "multipass"), default="scan")
+    parser.add_argument("--backend", choices=("native", "jinja"), default="native")
+    parser.add_argument("--workdir", help="keep generated corpora here between runs")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="print ratios against an earlier JSON file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args(sys.argv[1:]))
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+# Same default as main.py's --daemon; not imported from there, since this
+# client deliberately imports nothing of the generator and so starts fast.
+default_socket_path = "./.build/daemon.sock"
+
+
+def request(socket_path, payload):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Talk to a running build daemon")
+    parser.add_argument("--socket", default=default_socket_path)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser(
+        "rebuild", help="rebuild what changed, or only the given files"
+    )
+    rebuild_parser.add_argument("paths", nargs="*")
+    render_parser = commands.add_parser(
+        "render", help="print the page a markdown file (default: stdin) renders to"
+    )
+    render_parser.add_argument("path", nargs="?")
+    commands.add_parser("status")
+    commands.add_parser("stop")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    payload = {"command": args.command}
+    if args.command == "rebuild" and args.paths:
+        # The daemon may run in another directory.
+        payload["paths"] = [os.path.abspath(path) for path in args.paths]
+    elif args.command == "render":
+        if args.path is None:
+            payload["markdown"] = sys.stdin.read()
+        else:
+            with open(args.path, "r") as f:
+                payload["markdown"] = f.read()
+
+    try:
+        response = request(args.socket, payload)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.exit(f"no daemon on {args.socket}; start one with main.py --daemon")
+    sys.stdout.write(response.get("output", ""))
+    if "html" in response:
+        sys.stdout.write(response["html"])
+    if not response["ok"]:
+        sys.exit(f"error: {response['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import struct
+import zlib
+
+from manifest import atomic_write, hash_file
+
+
+# Formats that are compressed already; gzipping them again only costs time.
+COMPRESSED_EXTENSIONS = frozenset(
+    (
+        ".avif",
+        ".br",
+        ".gif",
+        ".gz",
+        ".jpeg",
+        ".jpg",
+        ".mp3",
+        ".mp4",
+        ".png",
+        ".webm",
+        ".webp",
+        ".woff",
+        ".woff2",
+        ".zip",
+    )
+)
+GZIP_MAGIC = b"\x1f\x8b"
+FCOMMENT = 0x10
+DIGEST_PREFIX = b"sha256:"
+
+
+def should_compress(path):
+    name = os.path.basename(path)
+    # Dotfiles (.gitignore, .nojekyll) are never served to browsers.
+    if name.startswith("."):
+        return False
+    return os.path.splitext(name)[1].lower() not in COMPRESSED_EXTENSIONS
+
+
+def gzip_variant(path, level=9):
+    """Write path + ".gz" next to `path`, unless it's already up to date.
+
+    The .gz file records the SHA-256 of the bytes it was made from and the
+    compression level in its header comment, so a variant made from the
+    same source at the same level is recognized from its first few bytes
+    and left alone. Returns whether it was written.
+    """
+    path = os.fspath(path)
+    if not should_compress(path):
+        return False
+    digest = hash_file(path).encode("ascii")
+    gz_path = path + ".gz"
+    if read_source_tag(gz_path) == (digest, level):
+        return False
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = 0
+    size = 0
+    with open(path, "rb") as src, atomic_write(gz_path, "wb") as dst:
+        dst.write(_gzip_header(level, digest))
+        for chunk in iter(lambda: src.read(1 << 20), b""):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            dst.write(compressor.compress(chunk))
+        dst.write(compressor.flush())
+        dst.write(struct.pack("<II", crc, size & 0xFFFFFFFF))
+    return True
+
+
+def has_variant(path, level):
+    # Whether path + ".gz" exists at `level`, without checking its source.
+    tag = read_source_tag(os.fspath(path) + ".gz")
+    return tag is not None and tag[1] == level
+
+
+def remove_variants(paths):
+    """Delete the .gz variant of each of `paths`; returns the removed ones."""
+    removed = []
+    for path in paths:
+        gz_path = os.fspath(path) + ".gz"
+        if os.path.isfile(gz_path):
+            os.remove(gz_path)
+            removed.append(gz_path)
+    return removed
+
+
+def read_source_tag(gz_path):
+    """(source digest, level) from the header of a .gz gzip_variant wrote."""
+    try:
+        with open(gz_path, "rb") as f:
+            header = f.read(10)
+            if len(header) < 10 or header[:2] != GZIP_MAGIC or header[3] != FCOMMENT:
+                return None
+            comment = f.read(len(DIGEST_PREFIX) + 68)
+    except FileNotFoundError:
+        return None
+    if not comment.startswith(DIGEST_PREFIX):
+        return None
+    tag = comment[len(DIGEST_PREFIX) :].split(b"\0", 1)[0]
+    digest, sep, level = tag.partition(b":")
+    if sep != b":" or not level.isdigit():
+        return None
+    return digest, int(level)
+
+
+def _gzip_header(level, digest):
+    # RFC 1952: deflate, no mtime so the output is reproducible, the
+    # source digest and level as the comment, "unknown" OS.
+    extra_flags = 2 if level == 9 else 4 if level == 1 else 0
+    header = GZIP_MAGIC + bytes((8, FCOMMENT)) + struct.pack("<I", 0)
+    comment = DIGEST_PREFIX + digest + b":" + str(level).encode("ascii") + b"\0"
+    return header + bytes((extra_flags, 255)) + comment
@@ -1,16 +1,200 @@
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
+from compress import gzip_variant, has_variant, should_compress
+from imagemeta import recompress_png
+from manifest import atomic_write, hash_file
+from progress import Progress
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
-    if not os.path.exists(dest_dir_path):
-        os.mkdir(dest_dir_path)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
-    for filename in os.listdir(source_dir_path):
-        from_path = os.path.join(source_dir_path, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        print(f" * {from_path} -> {dest_path}")
-        if os.path.isfile(from_path):
-            shutil.copy(from_path, dest_path)
+
+# ioctl request number of FICLONE on Linux (reflink on btrfs, XFS, ...).
+FICLONE = 0x40049409
+
+
+def sync_files(
+    source_dir_path,
+    dest_dir_path,
+    manifest=None,
+    checksum=False,
+    hardlink=False,
+    jobs=None,
+    quiet=False,
+    gzip_level=None,
+    recompress_pngs=False,
+    routes=None,
+):
+    """Bring dest_dir_path in line with source_dir_path, copying only changes.
+
+    A file is up to date when its size and mtime match the source; with
+    `checksum`, files whose mtime differs but whose contents hash the same
+    are kept as well. Copies run on a thread pool. With `gzip_level`, each
+    copied file also gets a .gz variant, as does any file missing one at
+    that level. With `recompress_pngs`, PNGs are written losslessly
+    recompressed, and are up to date when the mtime matches. Every file is
+    added to the `routes` RouteIndex, if given. Returns the list of copied
+    (from_path, dest_path) pairs.
+    """
+    files = []
+    _collect_files(source_dir_path, dest_dir_path, files)
+
+    to_copy = []
+    to_compress = []
+    for from_path, dest_path, from_stat in files:
+        recompress = recompress_pngs and from_path.lower().endswith(".png")
+        signature = f"{from_stat.st_size}:{from_stat.st_mtime_ns}"
+        if recompress:
+            # Plain copies keep the source's mtime too, so only the manifest
+            # tells whether the last build recompressed this one.
+            signature += ":recompressed"
+            up_to_date = _is_same_mtime(dest_path, from_stat) and (
+                manifest is None
+                or manifest.is_fresh("static", from_path, signature, dest_path)
+            )
         else:
-            copy_files_recursive(from_path, dest_path)
+            up_to_date = _is_up_to_date(from_path, dest_path, from_stat, checksum)
+        if not up_to_date:
+            to_copy.append((from_path, dest_path, recompress))
+        elif (
+            gzip_level is not None
+            and should_compress(dest_path)
+            and not has_variant(dest_path, gzip_level)
+        ):
+            to_compress.append(dest_path)
+        if manifest is not None:
+            manifest.record("static", from_path, signature, dest_path)
+        if routes is not None:
+            routes.add(dest_path)
+
+    if len(to_copy) + len(to_compress) <= 1:
+        for from_path, dest_path, recompress in to_copy:
+            _publish(from_path, dest_path, hardlink, gzip_level, recompress)
+        for dest_path in to_compress:
+            gzip_variant(dest_path, gzip_level)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    _publish, from_path, dest_path, hardlink, gzip_level, recompress
+                )
+                for from_path, dest_path, recompress in to_copy
+            ]
+            futures.extend(
+                executor.submit(gzip_variant, dest_path, gzip_level)
+                for dest_path in to_compress
+            )
+            for future in futures:
+                future.result()
+    progress = Progress("static files", len(to_copy), quiet)
+    for from_path, dest_path, _ in to_copy:
+        progress.advance(f" * {from_path} -> {dest_path}")
+    progress.finish()
+    return [(from_path, dest_path) for from_path, dest_path, _ in to_copy]
+
+
+def _collect_files(source_dir_path, dest_dir_path, files):
+    os.makedirs(dest_dir_path, exist_ok=True)
+    with os.scandir(source_dir_path) as entries:
+        for entry in entries:
+            dest_path = os.path.join(dest_dir_path, entry.name)
+            if entry.is_dir():
+                _collect_files(entry.path, dest_path, files)
+            else:
+                files.append((entry.path, dest_path, entry.stat()))
+
+
+def _is_up_to_date(from_path, dest_path, from_stat, checksum):
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if dest_stat.st_size != from_stat.st_size:
+        return False
+    if dest_stat.st_mtime_ns == from_stat.st_mtime_ns:
+        return True
+    if checksum and hash_file(from_path) == hash_file(dest_path):
+        shutil.copystat(from_path, dest_path)
+        return True
+    return False
+
+
+def _is_same_mtime(dest_path, from_stat):
+    try:
+        return os.stat(dest_path).st_mtime_ns == from_stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _publish(from_path, dest_path, hardlink, gzip_level, recompress=False):
+    if recompress:
+        copy_png_recompressed(from_path, dest_path)
+    else:
+        copy_file(from_path, dest_path, hardlink)
+    if gzip_level is not None:
+        gzip_variant(dest_path, gzip_level)
+
+
+def copy_file(from_path, dest_path, hardlink=False):
+    # Written to a temporary name and renamed into place, so readers never
+    # see a half-copied file and an old hardlink is replaced, not written
+    # through.
+    if hardlink and _link_into_place(from_path, dest_path):
+        return
+    with atomic_write(dest_path, "wb") as dst:
+        _copy_contents(from_path, dst)
+        _copy_stat(from_path, dst)
+
+
+def copy_png_recompressed(from_path, dest_path):
+    with open(from_path, "rb") as f:
+        data = recompress_png(f.read())
+    if data is None:
+        copy_file(from_path, dest_path)
+        return
+    with atomic_write(dest_path, "wb") as f:
+        f.write(data)
+        _copy_stat(from_path, f)
+
+
+def _link_into_place(from_path, dest_path):
+    tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+    try:
+        os.link(from_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _copy_stat(from_path, dst):
+    # Flushed first, so closing `dst` doesn't write and bump its mtime.
+    dst.flush()
+    shutil.copystat(from_path, dst.name)
+
+
+def _copy_contents(from_path, dst):
+    with open(from_path, "rb") as src:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(src.fileno(), dst.fileno(), 1 << 30) > 0:
+                    pass
+                return
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        shutil.copyfileobj(src, dst, 1 << 20)
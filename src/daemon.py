@@ -0,0 +1,183 @@
+import contextlib
+import io
+import json
+import os
+import socketserver
+import time
+
+from gencontent import PageOptions, render_page_html
+from imagemeta import load_image_index
+from parsecache import MemoryParseCache
+from template import load_template
+from watch import _is_within, changed_paths, rebuild, snapshot
+
+
+class BuildDaemon:
+    """What a resident build process keeps warm between requests.
+
+    That's the compiled template, the image sizes, a snapshot of the source
+    tree and the rendered page bodies. Every path is kept absolute, since
+    clients may run from anywhere.
+    """
+
+    def __init__(
+        self,
+        dir_path_content,
+        dir_path_static,
+        template_path,
+        dest_dir_path,
+        basepath,
+        template=None,
+        image_cache_path=None,
+        cache_size=512 * 2**20,
+        gzip_level=None,
+        checksum=False,
+        hardlink=False,
+        recompress_pngs=False,
+    ):
+        self.dir_path_content = os.path.abspath(dir_path_content)
+        self.dir_path_static = os.path.abspath(dir_path_static)
+        self.template_path = os.path.abspath(template_path)
+        self.dest_dir_path = os.path.abspath(dest_dir_path)
+        self.basepath = basepath
+        if template is None:
+            template = load_template(self.template_path, basepath)
+        self.template = template
+        self.image_cache_path = image_cache_path
+        self.images = None
+        if image_cache_path is not None:
+            self.images = load_image_index(self.dir_path_static, image_cache_path)
+        self.cache = MemoryParseCache(cache_size)
+        self.gzip_level = gzip_level
+        self.checksum = checksum
+        self.hardlink = hardlink
+        self.recompress_pngs = recompress_pngs
+        self.state = self.snapshot()
+
+    def snapshot(self):
+        return snapshot(self.dir_path_content, self.dir_path_static, self.template_path)
+
+    def rebuild(self, paths=None):
+        """Rebuild what changed since the last rebuild, or only `paths`.
+
+        Without `paths` the source tree is rescanned; with them, only those
+        files are checked, which skips the scan. Returns how many changed.
+        """
+        if paths is None:
+            new_state = self.snapshot()
+            changed = changed_paths(self.state, new_state)
+            self.state = new_state
+        else:
+            changed = set()
+            for path in map(os.path.abspath, paths):
+                current = snapshot(path)
+                if os.path.isdir(path):
+                    old = {p: s for p, s in self.state.items() if _is_within(p, path)}
+                    changed |= changed_paths(old, current)
+                    # Files deleted under `path` must leave the snapshot too.
+                    for old_path in old:
+                        del self.state[old_path]
+                else:
+                    changed.add(path)
+                    self.state.pop(path, None)
+                self.state.update(current)
+        if not changed:
+            return 0
+        if self.template_path in changed:
+            self.template = load_template(self.template_path, self.basepath)
+        all_pages = False
+        if self.images is not None and any(
+            _is_within(path, self.dir_path_static) for path in changed
+        ):
+            images = load_image_index(self.dir_path_static, self.image_cache_path)
+            all_pages = images.digest != self.images.digest
+            self.images = images
+        rebuild(
+            changed,
+            self.dir_path_content,
+            self.dir_path_static,
+            self.template_path,
+            self.dest_dir_path,
+            self.basepath,
+            self.template,
+            self.images,
+            all_pages,
+            self.cache,
+            self.gzip_level,
+            checksum=self.checksum,
+            hardlink=self.hardlink,
+            recompress_pngs=self.recompress_pngs,
+        )
+        return len(changed)
+
+    def render(self, markdown):
+        options = PageOptions(
+            self.template_path,
+            self.basepath,
+            self.template,
+            cache=self.cache,
+            images=self.images,
+        )
+        return render_page_html(markdown, options)
+
+    def handle(self, request):
+        """The response to one request.
+
+        A request is a dict whose "command" is "rebuild" (with optional
+        "paths"), "render" (with "markdown"), "status" or "stop".
+        """
+        command = request.get("command")
+        output = io.StringIO()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(output):
+                if command == "rebuild":
+                    count = self.rebuild(request.get("paths"))
+                    elapsed = (time.perf_counter() - start) * 1000
+                    print(f"Rebuilt {count} changed file(s) in {elapsed:.0f} ms")
+                elif command == "render":
+                    return {"ok": True, "html": self.render(request["markdown"])}
+                elif command == "status":
+                    print(
+                        f"Serving {self.dest_dir_path}: {len(self.state)} source "
+                        f"files, {len(self.cache.entries)} cached pages"
+                    )
+                elif command != "stop":
+                    raise ValueError(f"unknown command: {command!r}")
+        except Exception as e:
+            return {"ok": False, "output": output.getvalue(), "error": str(e)}
+        return {"ok": True, "output": output.getvalue()}
+
+
+def serve(daemon, socket_path):
+    """Answer requests on the Unix socket at socket_path until "stop".
+
+    Each connection sends one JSON request line and gets one JSON response
+    line. Requests are handled one at a time, so builds never overlap.
+    """
+    stopped = False
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            nonlocal stopped
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError as e:
+                response = {"ok": False, "error": f"bad request: {e}"}
+            else:
+                response = daemon.handle(request)
+                stopped = request.get("command") == "stop"
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    with socketserver.UnixStreamServer(socket_path, Handler) as server:
+        print(f"Listening on {socket_path}")
+        try:
+            while not stopped:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+
+class TempDirTestCase(unittest.TestCase):
+    """A test case with a fresh temporary directory, `root`, per test.
+
+    write() paths are relative to `root` joined with the class's
+    `write_dir`, unless they're absolute.
+    """
+
+    write_dir = ""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        # Text or bytes; missing directories are created. Returns the path.
+        path = os.path.join(self.root, self.write_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        return path
+
+    def read_tree(self, root):
+        # Every file under `root`, by path relative to it.
+        tree = {}
+        for dir_path, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dir_path, filename)
+                with open(path, "rb") as f:
+                    tree[os.path.relpath(path, root)] = f.read()
+        return tree
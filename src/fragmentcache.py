@@ -0,0 +1,90 @@
+import hashlib
+from collections import OrderedDict
+
+
+# Rough per-entry cost besides the HTML itself: the key, the dict slot and
+# the string header.
+ENTRY_OVERHEAD = 128
+
+
+class FragmentCache:
+    """Rendered HTML of blocks, keyed by a hash of the block's text.
+
+    Shared by every page rendered in one process, so a block repeated
+    across pages (a footer, a disclaimer) is only converted once. Each
+    entry is (html, record), the record being what the block's conversion
+    collected (see RenderContext.record), or None. The least recently used
+    fragments are evicted beyond max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, context_key, block_type, lines):
+        text = f"{context_key}\0{block_type.value}\0" + "\n".join(lines)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, html, record=None):
+        if key in self.entries:
+            return
+        self.entries[key] = (html, record)
+        self.size += _entry_size(html, record)
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= _entry_size(*evicted)
+
+
+class FragmentStats:
+    """Fragment cache hits and misses summed over the pages of a build."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return (
+            f"Block fragment cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate)"
+        )
+
+
+def _entry_size(html, record):
+    size = len(html) + ENTRY_OVERHEAD
+    if record is not None:
+        for part in record:
+            if part:
+                size += sum(len(item) + ENTRY_OVERHEAD for item in part)
+    return size
+
+
+_shared_cache = None
+
+
+def shared_fragment_cache(max_bytes):
+    # One cache per process; pool workers each build up their own.
+    global _shared_cache
+    if _shared_cache is None or _shared_cache.max_bytes != max_bytes:
+        _shared_cache = FragmentCache(max_bytes)
+    return _shared_cache
@@ -1,43 +1,514 @@
+import asyncio
+import heapq
+import itertools
 import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from markdown_blocks import markdown_to_html_node
+from compress import gzip_variant
+from fragmentcache import FragmentStats, shared_fragment_cache
+from manifest import hash_file
+from markdown_blocks import (
+    blocks_to_html_node,
+    iter_blocks,
+    iter_blocks_html,
+    markdown_to_html_node,
+    scan_blocks,
+)
+from profiler import PageProfile
+from progress import Progress
+from rendercontext import RenderContext
+from routes import PageLinks
+from searchindex import PageTerms, page_url
+from template import load_template
 
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
+class PageBuildError(Exception):
+    def __init__(self, path, reason):
+        super().__init__(path, reason)
+        self.path = path
+        self.reason = reason
+
+    def __str__(self):
+        return f"failed to generate {self.path}: {self.reason}"
+
+
+class PageResult:
+    """What building one page reports back to generate_pages_recursive.
+
+    `fragment_counts` is the (hits, misses) the page had in the fragment
+    cache, or None without one; `search` is its PageTerms when indexing
+    and `links` its PageLinks when checking links.
+    """
+
+    def __init__(
+        self,
+        from_path,
+        dest_path,
+        profile=None,
+        fragment_counts=None,
+        search=None,
+        links=None,
+    ):
+        self.from_path = from_path
+        self.dest_path = dest_path
+        self.profile = profile
+        self.fragment_counts = fragment_counts
+        self.search = search
+        self.links = links
+
+
+class PageOptions:
+    """Settings shared by every page of a build; shipped to pool workers."""
+
+    def __init__(
+        self,
+        template_path,
+        basepath,
+        template=None,
+        *,
+        profile=False,
+        cache=None,
+        stream_above=None,
+        assets=None,
+        gzip_level=None,
+        images=None,
+        fragment_cache_size=None,
+        minify=False,
+        search=False,
+        links=False,
+    ):
+        if template is None:
+            template = load_template(template_path, basepath, assets, minify)
+        self.template_path = template_path
+        self.basepath = basepath
+        self.template = template
+        self.profile = profile
+        self.cache = cache
+        # Sources of at least this many bytes are streamed (see stream_page).
+        self.stream_above = stream_above
+        self.assets = assets
+        # Compression level of the .gz written next to each page, if any.
+        self.gzip_level = gzip_level
+        self.images = images
+        # Byte budget of the per-process block fragment cache, if any.
+        self.fragment_cache_size = fragment_cache_size
+        self.minify = minify
+        # Whether pages collect their terms for the search index.
+        self.search = search
+        # Whether pages collect their links and heading IDs for checking.
+        self.links = links
+
+    def context(self, profile=None):
+        return RenderContext(
+            self.basepath,
+            profile=profile,
+            assets=self.assets,
+            images=self.images,
+            fragments=self.fragment_cache(),
+            minify=self.minify,
+            search=PageTerms() if self.search else None,
+            links=PageLinks() if self.links else None,
+        )
+
+    def fragment_cache(self):
+        if self.fragment_cache_size is None:
+            return None
+        return shared_fragment_cache(self.fragment_cache_size)
+
+    def should_stream(self, from_path):
+        if self.stream_above is None or self.profile:
+            return False
+        return os.path.getsize(from_path) >= self.stream_above
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath,
+    *,
+    manifest=None,
+    jobs=1,
+    template=None,
+    quiet=False,
+    profiler=None,
+    cache=None,
+    max_open=None,
+    stream_above=None,
+    assets=None,
+    gzip_level=None,
+    images=None,
+    fragment_cache_size=None,
+    minify=False,
+    search_index=None,
+    link_report=None,
+    shard=None,
+):
+    """Build every page under dir_path_content into dest_dir_path.
+
+    Returns the summed FragmentStats when a fragment cache is used. With a
+    search_index, the terms of every built page are merged into it; with a
+    link_report, every page is added to its route index and the links and
+    headings of every built page are recorded in it. With shard = (I, N),
+    only the I-th of partition_pages' N slices is built.
+    """
+    all_pages = discover_pages(dir_path_content, dest_dir_path)
+    pages = all_pages
+    if shard is not None:
+        pages = partition_pages(all_pages, shard[1])[shard[0] - 1]
+    if link_report is not None:
+        for _, dest_path in all_pages:
+            link_report.routes.add(dest_path)
+    if manifest is not None:
+        pages = filter_stale_pages(pages, manifest)
+    indexes = [index for index in (search_index, link_report) if index is not None]
+    for index in indexes:
+        index.retain(str(from_path) for from_path, _ in all_pages)
+    if manifest is not None and indexes:
+        # Fresh pages still need building if an index lacks them.
+        stale = {from_path for from_path, _ in pages}
+        pages += [
+            page
+            for page in all_pages
+            if page[0] not in stale
+            and any(str(page[0]) not in index.pages for index in indexes)
+        ]
+    options = PageOptions(
+        template_path,
+        basepath,
+        template,
+        profile=profiler is not None,
+        cache=cache,
+        stream_above=stream_above,
+        assets=assets,
+        gzip_level=gzip_level,
+        images=images,
+        fragment_cache_size=fragment_cache_size,
+        minify=minify,
+        search=search_index is not None,
+        links=link_report is not None,
+    )
+    progress = Progress("pages", len(pages), quiet)
+    fragment_stats = None if fragment_cache_size is None else FragmentStats()
+
+    def page_done(result):
+        progress.advance(
+            f" * {result.from_path} {template_path} -> {result.dest_path}"
+        )
+        if profiler is not None:
+            profiler.add(result.profile)
+        if result.fragment_counts is not None:
+            fragment_stats.add(*result.fragment_counts)
+        if search_index is not None:
+            url = page_url(dest_dir_path, result.dest_path, basepath)
+            search_index.add_page(str(result.from_path), url, result.search)
+        if link_report is not None:
+            link_report.add_page(
+                str(result.from_path), result.dest_path, result.links
+            )
+
+    if max_open is not None and profiler is None:
+        generate_pages_async(pages, options, jobs, max_open, page_done)
+    else:
+        if jobs > 1 and len(pages) > 1:
+            results = generate_pages_parallel(pages, options, jobs)
+        else:
+            results = (
+                build_page(from_path, dest_path, options)
+                for from_path, dest_path in pages
+            )
+        for result in results:
+            page_done(result)
+    progress.finish()
+    return fragment_stats
+
+
+def discover_pages(dir_path_content, dest_dir_path):
+    pages = []
     for filename in os.listdir(dir_path_content):
         from_path = os.path.join(dir_path_content, filename)
         dest_path = os.path.join(dest_dir_path, filename)
         if os.path.isfile(from_path):
-            dest_path = Path(dest_path).with_suffix(".html")
-            generate_page(from_path, template_path, dest_path, basepath)
+            pages.append((from_path, Path(dest_path).with_suffix(".html")))
         else:
-            generate_pages_recursive(from_path, template_path, dest_path, basepath)
+            pages.extend(discover_pages(from_path, dest_path))
+    return pages
+
+
+def partition_pages(pages, count):
+    """Split `pages` into `count` slices of about the same total source size.
+
+    Depends only on the sources' paths and sizes, not on the order they
+    were discovered in, so every machine of a sharded build gets the same
+    slices. Pages go largest first to the slice with the least so far.
+    """
+    sized = sorted(
+        (
+            (os.path.getsize(from_path), str(from_path), dest_path)
+            for from_path, dest_path in pages
+        ),
+        key=lambda page: (-page[0], page[1]),
+    )
+    slices = [[] for _ in range(count)]
+    loads = [(0, i) for i in range(count)]
+    for size, from_path, dest_path in sized:
+        load, i = heapq.heappop(loads)
+        slices[i].append((from_path, dest_path))
+        heapq.heappush(loads, (load + size, i))
+    return slices
+
+
+def filter_stale_pages(pages, manifest):
+    stale = []
+    for from_path, dest_path in pages:
+        digest = hash_file(from_path)
+        if not manifest.is_fresh("pages", from_path, digest, str(dest_path)):
+            stale.append((from_path, dest_path))
+        manifest.record("pages", from_path, digest, str(dest_path))
+    return stale
+
+
+def generate_pages_parallel(pages, options, jobs):
+    # Largest sources first, one page per task, so one huge page can't end
+    # up as the tail, nor can a batch of the largest ones.
+    pages = sorted(pages, key=lambda page: os.path.getsize(page[0]), reverse=True)
+    initializer = tracemalloc.start if options.profile else None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+        yield from executor.map(
+            build_page,
+            [page[0] for page in pages],
+            [page[1] for page in pages],
+            [options] * len(pages),
+        )
+
+
+def generate_pages_async(pages, options, jobs, max_open, page_done):
+    """Build `pages` with reads and writes overlapping the rendering.
 
+    At most `max_open` pages are in flight, from reading the source to
+    writing the output, so that also caps the open files and the rendered
+    pages held in memory. Rendering runs on `jobs` worker processes, or on
+    a single thread alongside the I/O threads when `jobs` is 1.
+    """
+    asyncio.run(_build_pages_async(pages, options, jobs, max_open, page_done))
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f" * {from_path} {template_path} -> {dest_path}")
-    from_file = open(from_path, "r")
-    markdown_content = from_file.read()
-    from_file.close()
 
-    template_file = open(template_path, "r")
-    template = template_file.read()
-    template_file.close()
+async def _build_pages_async(pages, options, jobs, max_open, page_done):
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(max_open)
+    io_pool = ThreadPoolExecutor(max_workers=max_open)
+    if jobs > 1:
+        cpu_pool = ProcessPoolExecutor(max_workers=jobs)
+    else:
+        cpu_pool = ThreadPoolExecutor(max_workers=1)
 
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
+    async def build(from_path, dest_path):
+        async with in_flight:
+            if options.should_stream(from_path):
+                return await loop.run_in_executor(
+                    cpu_pool, build_page, from_path, dest_path, options
+                )
+            try:
+                markdown_content = await loop.run_in_executor(
+                    io_pool, _read_source, from_path
+                )
+                page, result = await loop.run_in_executor(
+                    cpu_pool,
+                    _render_page_html_result,
+                    from_path,
+                    dest_path,
+                    markdown_content,
+                    options,
+                )
+                await loop.run_in_executor(io_pool, _write_page, dest_path, page)
+                if options.gzip_level is not None:
+                    await loop.run_in_executor(
+                        cpu_pool, gzip_variant, dest_path, options.gzip_level
+                    )
+            except Exception as e:
+                raise PageBuildError(from_path, f"{type(e).__name__}: {e}") from e
+        return result
 
+    tasks = [asyncio.ensure_future(build(*page)) for page in pages]
+    try:
+        for task in asyncio.as_completed(tasks):
+            page_done(await task)
+    finally:
+        for task in tasks:
+            task.cancel()
+        io_pool.shutdown(cancel_futures=True)
+        cpu_pool.shutdown(cancel_futures=True)
+
+
+def _read_source(from_path):
+    with open(from_path, "r") as from_file:
+        return from_file.read()
+
+
+def _write_page(dest_path, page):
+    _make_parent_dirs(dest_path)
+    with open(dest_path, "w") as to_file:
+        to_file.write(page)
+
+
+def build_page(from_path, dest_path, options):
+    """Render one page and return its PageResult."""
+    page_profile = PageProfile(from_path) if options.profile else None
+    context = options.context(page_profile)
+    fragments = context.fragments
+    if fragments is not None:
+        hits, misses = fragments.hits, fragments.misses
+    try:
+        if page_profile is not None:
+            _render_page_profiled(from_path, dest_path, options, context)
+        elif options.should_stream(from_path):
+            stream_page(from_path, dest_path, options, context)
+        else:
+            render_page(from_path, dest_path, options, context)
+        if options.gzip_level is not None:
+            gzip_variant(dest_path, options.gzip_level)
+    except Exception as e:
+        raise PageBuildError(from_path, f"{type(e).__name__}: {e}") from e
+    fragment_counts = None
+    if fragments is not None:
+        fragment_counts = (fragments.hits - hits, fragments.misses - misses)
+    return PageResult(
+        from_path,
+        dest_path,
+        page_profile,
+        fragment_counts,
+        context.search,
+        context.links,
+    )
+
+
+def generate_page(from_path, template_path, dest_path, basepath, template=None):
+    render_page(from_path, dest_path, PageOptions(template_path, basepath, template))
+
+
+def render_page(from_path, dest_path, options, context=None):
+    markdown_content = _read_source(from_path)
+    title, content = page_content(markdown_content, options, context)
+    _make_parent_dirs(dest_path)
+    with open(dest_path, "w") as to_file:
+        options.template.write(to_file, Title=title, Content=content)
+
+
+def stream_page(from_path, dest_path, options, context=None):
+    """Render a page in memory that doesn't grow with the size of its source.
+
+    Lines are read lazily and turned into blocks, and each block is
+    converted and written before the next one is read. The title is the
+    first heading line, which must be found before any output is written,
+    so only the lines up to it are buffered. The parse cache is not used.
+    """
+    with open(from_path, "r") as from_file:
+        lines = (line[:-1] if line.endswith("\n") else line for line in from_file)
+        head = []
+        for line in lines:
+            head.append(line)
+            if line.startswith("# "):
+                title = line[2:]
+                break
+        else:
+            raise ValueError("no title found")
+        if context is None:
+            context = options.context()
+        _index_title(context, title)
+        blocks = iter_blocks(itertools.chain(head, lines))
+        content = iter_blocks_html(blocks, context)
+        _make_parent_dirs(dest_path)
+        with open(dest_path, "w") as to_file:
+            options.template.write(to_file, Title=title, Content=content)
+
+
+def render_page_html(markdown_content, options, context=None):
+    title, content = page_content(markdown_content, options, context)
+    if not isinstance(content, str):
+        content = "".join(content)
+    return options.template.render(Title=title, Content=content)
+
+
+def _render_page_html_result(from_path, dest_path, markdown_content, options):
+    # The page plus the PageResult build_page would return for it.
+    context = options.context()
+    fragments = context.fragments
+    fragment_counts = None
+    if fragments is None:
+        page = render_page_html(markdown_content, options, context)
+    else:
+        hits, misses = fragments.hits, fragments.misses
+        page = render_page_html(markdown_content, options, context)
+        fragment_counts = (fragments.hits - hits, fragments.misses - misses)
+    result = PageResult(
+        from_path, dest_path, None, fragment_counts, context.search, context.links
+    )
+    return page, result
+
+
+def page_content(markdown_content, options, context=None):
+    """Title and body of a page, the body from the parse cache if possible.
+
+    Without a cache the body is returned as an iterator of HTML chunks, so
+    it can be streamed into the output.
+    """
+    if context is None:
+        context = options.context()
+    cache = options.cache
+    if cache is None:
+        title = extract_title(markdown_content)
+        _index_title(context, title)
+        node = markdown_to_html_node(markdown_content, context)
+        return title, node.iter_html(context.minify)
+    key = cache.key(markdown_content, context.cache_key())
+    cached = cache.get(key)
+    if cached is not None:
+        title, content, record = cached
+        context.replay(record)
+        _index_title(context, title)
+        return title, content
     title = extract_title(markdown_content)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
-    template = template.replace('href="/', 'href="' + basepath)
-    template = template.replace('src="/', 'src="' + basepath)
+    _index_title(context, title)
+    content = markdown_to_html_node(markdown_content, context).to_html(context.minify)
+    cache.put(key, title, content, context.record())
+    return title, content
+
+
+def _render_page_profiled(from_path, dest_path, options, context):
+    # Same output as render_page, with the stages that it interleaves
+    # (block scanning and conversion, serializing and writing) run one
+    # after the other so each can be measured.
+    profile = context.profile
+    with profile.stage("read"):
+        with open(from_path, "r") as from_file:
+            markdown_content = from_file.read()
+    with profile.stage("block_split"):
+        blocks = list(scan_blocks(markdown_content))
+    with profile.stage("html_tree"):
+        node = blocks_to_html_node(blocks, context)
+    with profile.stage("serialize"):
+        html = node.to_html(options.minify)
+    with profile.stage("template_fill"):
+        title = extract_title(markdown_content)
+        _index_title(context, title)
+        page = options.template.render(Title=title, Content=html)
+    with profile.stage("write"):
+        _make_parent_dirs(dest_path)
+        with open(dest_path, "w") as to_file:
+            to_file.write(page)
+    profile.finish()
+
+
+def _index_title(context, title):
+    if context.search is not None:
+        context.search.title = title
+
 
+def _make_parent_dirs(dest_path):
     dest_dir_path = os.path.dirname(dest_path)
     if dest_dir_path != "":
         os.makedirs(dest_dir_path, exist_ok=True)
-    to_file = open(dest_path, "w")
-    to_file.write(template)
 
 
 def extract_title(md):
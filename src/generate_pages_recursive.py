@@ -1,77 +1,183 @@
+import html
 import os
+import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import markdown
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
+from gencontent import extract_title
+from progress import Progress
+from template import rewrite_urls
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+MARKDOWN_EXTENSIONS = ['meta', 'fenced_code', 'tables']
+# An <img> tag as python-markdown writes it: its attributes up to and
+# including src, the rest of them, and the tag's end.
+IMG_TAG_PATTERN = re.compile(r'(<img\b[^>]*?\bsrc="([^"]*)"[^>]*?)(\s*/?>)')
+
+# Per-process renderer state, set up once by _init_renderer. markdown.Markdown
+# keeps state between conversions, so every worker needs its own instance.
+_renderer = None
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath='/',
+    jobs=1,
+    bytecode_cache_dir=None,
+    quiet=False,
+    images=None,
+):
     """
     Recursively crawl content directory and generate HTML pages from markdown files.
-    
+
     Args:
         dir_path_content (str): Path to the content directory containing markdown files
         template_path (str): Path to the template.html file
         dest_dir_path (str): Path to the destination directory (public)
+        basepath (str): URL prefix the site is served from
+        jobs (int): Number of worker processes rendering pages
+        bytecode_cache_dir (str): Directory for Jinja's compiled template cache,
+            kept between builds; None compiles the template in every process
+        quiet (bool): Show a progress line instead of one line per file
+        images (ImageIndex): Sizes of the images in static/, added to <img>
+            tags along with lazy loading; None leaves the tags as they are
     """
-    
+
     content_dir = Path(dir_path_content)
     template_file = Path(template_path)
     dest_dir = Path(dest_dir_path)
-    
+
     if not content_dir.exists():
         raise FileNotFoundError(f"Content directory not found: {content_dir}")
-    
+
     if not template_file.exists():
         raise FileNotFoundError(f"Template file not found: {template_file}")
-    
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    
-    template_dir = template_file.parent
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template(template_file.name)
-    
-    md = markdown.Markdown(extensions=['meta', 'fenced_code', 'tables'])
-    
+
+    pages = []
+    assets = []
     for root, dirs, files in os.walk(content_dir):
         root_path = Path(root)
-        
-        rel_path = root_path.relative_to(content_dir)
-        
-        dest_subdir = dest_dir / rel_path
-        dest_subdir.mkdir(parents=True, exist_ok=True)
-        
+        dest_subdir = dest_dir / root_path.relative_to(content_dir)
         for file in files:
             file_path = root_path / file
-            
-            if file_path.suffix.lower() in ['.md', '.markdown']:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    markdown_content = f.read()
-                
-                html_content = md.convert(markdown_content)
-                
-                metadata = getattr(md, 'Meta', {})
-                
-                context = {
-                    'content': html_content,
-                    'title': metadata.get('title', [file_path.stem])[0] if metadata.get('title') else file_path.stem,
-                    'meta': metadata,
-                    'filename': file_path.stem
-                }
-                
-                rendered_html = template.render(context)
-                
-                output_filename = file_path.stem + '.html'
-                output_path = dest_subdir / output_filename
-                
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(rendered_html)
-                
-                print(f"Generated: {output_path}")
-                
-                md.reset()
-            
+            if file_path.suffix.lower() in MARKDOWN_SUFFIXES:
+                pages.append((file_path, dest_subdir / (file_path.stem + '.html')))
             else:
-                dest_file = dest_subdir / file
-                shutil.copy2(file_path, dest_file)
-                print(f"Copied: {dest_file}")
+                assets.append((file_path, dest_subdir / file))
+
+    # One makedirs per output directory, not one per visited directory.
+    for dest_subdir in sorted({str(output.parent) for _, output in pages + assets}):
+        os.makedirs(dest_subdir, exist_ok=True)
+
+    if bytecode_cache_dir is not None:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+    renderer_args = (str(template_file), basepath, bytecode_cache_dir, images)
+    progress = Progress("pages", len(pages), quiet)
+    if jobs > 1 and len(pages) > 1:
+        # Largest sources first, one page per task, so the biggest pages
+        # are spread over the workers instead of ending up as the tail.
+        pages.sort(key=lambda page: os.path.getsize(page[0]), reverse=True)
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_renderer, initargs=renderer_args
+        ) as executor:
+            outputs = executor.map(
+                _render_page,
+                [page[0] for page in pages],
+                [page[1] for page in pages],
+            )
+            for output_path in outputs:
+                progress.advance(f"Generated: {output_path}")
+    else:
+        _init_renderer(*renderer_args)
+        for file_path, output_path in pages:
+            _render_page(file_path, output_path)
+            progress.advance(f"Generated: {output_path}")
+    progress.finish()
+
+    progress = Progress("assets", len(assets), quiet)
+    for file_path, dest_file in assets:
+        if _is_unchanged(file_path, dest_file):
+            continue
+        shutil.copy2(file_path, dest_file)
+        progress.advance(f"Copied: {dest_file}")
+    progress.finish()
+
+
+def _init_renderer(template_path, basepath, bytecode_cache_dir, images=None):
+    global _renderer
+    template_file = Path(template_path)
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    env = Environment(
+        loader=FileSystemLoader(template_file.parent), bytecode_cache=bytecode_cache
+    )
+    template = env.get_template(template_file.name)
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    _renderer = (template, md, basepath, images)
+
+
+def _render_page(file_path, output_path):
+    template, md, basepath, images = _renderer
+    with open(file_path, 'r', encoding='utf-8') as f:
+        markdown_content = f.read()
+
+    md.reset()
+    html_content = md.convert(markdown_content)
+    if images is not None:
+        html_content = _add_image_attributes(html_content, images)
+
+    metadata = getattr(md, 'Meta', {})
+    # The first "# " heading, as with the native backend; pages without
+    # one fall back to their "title:" metadata or file name.
+    try:
+        title = extract_title(markdown_content)
+    except ValueError:
+        title = metadata['title'][0] if metadata.get('title') else file_path.stem
+
+    context = {
+        'content': html_content,
+        'title': title,
+        'meta': metadata,
+        'filename': file_path.stem,
+        # The names used by template.html and the native builder.
+        'Content': html_content,
+        'Title': title,
+    }
+
+    rendered_html = rewrite_urls(template.render(context), basepath)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(rendered_html)
+    return output_path
+
+
+def _add_image_attributes(html_content, images):
+    def replace(match):
+        url = html.unescape(match.group(2))
+        attributes = ''.join(
+            f' {name}="{value}"' for name, value in images.attributes(url)
+        )
+        return match.group(1) + attributes + match.group(3)
+
+    return IMG_TAG_PATTERN.sub(replace, html_content)
+
+
+def _is_unchanged(file_path, dest_file):
+    # copy2 keeps the mtime, so a copy with the source's size and mtime is
+    # still current.
+    try:
+        dest_stat = os.stat(dest_file)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(file_path)
+    return (
+        dest_stat.st_size == source_stat.st_size
+        and dest_stat.st_mtime_ns == source_stat.st_mtime_ns
+    )
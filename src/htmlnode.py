@@ -1,26 +1,133 @@
+import sys
+
+from minify import RAW_TAGS, VOID_TAGS, attribute_html, collapse_whitespace
+
+
 class HTMLNode:
+    # Slotted, and props are kept as a tuple of (name, value) pairs: large
+    # pages allocate hundreds of thousands of these nodes.
+    __slots__ = ("tag", "value", "children", "_props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag
+        self.tag = sys.intern(tag) if tag is not None else None
         self.value = value
         self.children = children
         self.props = props
 
+    @property
+    def props(self):
+        if self._props is None:
+            return None
+        return dict(self._props)
+
+    @props.setter
+    def props(self, props):
+        if isinstance(props, dict):
+            props = tuple(props.items())
+        self._props = props
+
     def to_html(self):
         raise NotImplementedError("to_html method not implemented")
 
-    def props_to_html(self):
-        if self.props is None:
+    def props_to_html(self, minify=False):
+        if not self._props:
             return ""
-        props_html = ""
-        for prop in self.props:
-            props_html += f' {prop}="{self.props[prop]}"'
-        return props_html
+        if minify:
+            return "".join([attribute_html(prop, value) for prop, value in self._props])
+        return "".join([f' {prop}="{value}"' for prop, value in self._props])
+
+    def iter_html(self, minify=False):
+        if minify:
+            return self._iter_html_minified()
+        return self._iter_html()
+
+    def _iter_html(self):
+        # Walks the tree with an explicit stack of child iterators instead of
+        # recursing, so deep documents can't hit the recursion limit. Output
+        # is collected in a small list and yielded in batches.
+        parts = []
+        append = parts.append
+        stack = [(iter((self,)), "")]
+        while stack:
+            children, close_tag = stack[-1]
+            for node in children:
+                if type(node) is LeafNode:
+                    if node.value is None:
+                        raise ValueError("invalid HTML: no value")
+                    if node.tag is None:
+                        append(node.value)
+                    else:
+                        props_html = node.props_to_html()
+                        append(f"<{node.tag}{props_html}>{node.value}</{node.tag}>")
+                elif isinstance(node, ParentNode):
+                    node.check_html()
+                    append(f"<{node.tag}{node.props_to_html()}>")
+                    stack.append((iter(node.children), f"</{node.tag}>"))
+                    break
+                else:
+                    append(node.to_html())
+            else:
+                stack.pop()
+                append(close_tag)
+            if len(parts) >= 1024:
+                yield "".join(parts)
+                parts.clear()
+        if parts:
+            yield "".join(parts)
+
+    def _iter_html_minified(self):
+        # The same walk as _iter_html, minifying as it goes: whitespace in
+        # text collapses to one space, optional attribute quotes and void
+        # element end tags are dropped. Each stack entry also records
+        # whether it's inside a raw element, whose text is kept as it is.
+        parts = []
+        append = parts.append
+        stack = [(iter((self,)), "", False)]
+        while stack:
+            children, close_tag, raw = stack[-1]
+            for node in children:
+                if type(node) is LeafNode:
+                    if node.value is None:
+                        raise ValueError("invalid HTML: no value")
+                    tag = node.tag
+                    value = node.value
+                    if not raw and tag not in RAW_TAGS:
+                        value = collapse_whitespace(value)
+                    if tag is None:
+                        append(value)
+                    elif tag in VOID_TAGS and value == "":
+                        append(f"<{tag}{node.props_to_html(True)}>")
+                    else:
+                        append(f"<{tag}{node.props_to_html(True)}>{value}</{tag}>")
+                elif isinstance(node, ParentNode):
+                    node.check_html()
+                    append(f"<{node.tag}{node.props_to_html(True)}>")
+                    inner_raw = raw or node.tag in RAW_TAGS
+                    stack.append((iter(node.children), f"</{node.tag}>", inner_raw))
+                    break
+                else:
+                    append(node.to_html())
+            else:
+                stack.pop()
+                append(close_tag)
+            if len(parts) >= 1024:
+                yield "".join(parts)
+                parts.clear()
+        if parts:
+            yield "".join(parts)
+
+    def write_html(self, fp, minify=False):
+        write = fp.write
+        for chunk in self.iter_html(minify):
+            write(chunk)
 
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})"
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
@@ -35,19 +142,35 @@ class LeafNode(HTMLNode):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
+class RawHTMLNode(LeafNode):
+    """HTML that was rendered already, emitted exactly as it is."""
+
+    __slots__ = ()
+
+    def __init__(self, html):
+        super().__init__(None, html)
+
+    def to_html(self):
+        return self.value
+
+    def __repr__(self):
+        return f"RawHTMLNode({self.value})"
+
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def check_html(self):
         if self.tag is None:
             raise ValueError("invalid HTML: no tag")
         if self.children is None:
             raise ValueError("invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+
+    def to_html(self, minify=False):
+        return "".join(self.iter_html(minify))
 
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
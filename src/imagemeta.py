@@ -0,0 +1,181 @@
+import json
+import os
+import struct
+import zlib
+
+from manifest import atomic_write, hash_bytes
+
+
+IMAGE_EXTENSIONS = frozenset((".gif", ".jpeg", ".jpg", ".png", ".webp"))
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers; C4, C8 and CC are other segments.
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+CACHE_VERSION = 2
+
+
+class ImageIndex:
+    """Intrinsic sizes of the images in static/, by site-absolute URL."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        listing = "\n".join(f"{url} {w} {h}" for url, (w, h) in sorted(sizes.items()))
+        self.digest = hash_bytes(listing.encode("utf-8"))
+
+    def attributes(self, url):
+        # Props for an <img> of `url`, after src and alt. Every image loads
+        # lazily; only local images have a known size to reserve.
+        size = self.sizes.get(url.split("?", 1)[0].split("#", 1)[0])
+        if size is None:
+            return (("loading", "lazy"), ("decoding", "async"))
+        return (
+            ("width", str(size[0])),
+            ("height", str(size[1])),
+            ("loading", "lazy"),
+            ("decoding", "async"),
+        )
+
+
+def load_image_index(source_dir_path, cache_path):
+    """Read the size of every image under source_dir_path.
+
+    The cache at cache_path maps each image's URL to its file size, mtime
+    and dimensions, so only the headers of new or modified files are read.
+    It's rewritten with the current images.
+    """
+    cached = {}
+    try:
+        with open(cache_path, "r") as f:
+            data = json.load(f)
+        if data.get("version") == CACHE_VERSION:
+            cached = data["images"]
+    except (FileNotFoundError, ValueError):
+        pass
+
+    sizes = {}
+    current = {}
+    for dir_path, _, file_names in os.walk(source_dir_path):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(dir_path, file_name)
+            url = "/" + os.path.relpath(path, source_dir_path).replace(os.sep, "/")
+            stat = os.stat(path)
+            entry = cached.get(url)
+            if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+                # Files that aren't readable images are cached without a size.
+                size = read_image_size(path) or ()
+                entry = [stat.st_size, stat.st_mtime_ns, *size]
+            current[url] = entry
+            if len(entry) == 4:
+                sizes[url] = tuple(entry[2:])
+
+    if current != cached:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with atomic_write(cache_path) as f:
+            json.dump({"version": CACHE_VERSION, "images": current}, f, sort_keys=True)
+    return ImageIndex(sizes)
+
+
+def read_image_size(path):
+    """(width, height) from the header of a PNG, GIF, JPEG or WebP file.
+
+    Returns None for other formats and for files too broken to tell.
+    """
+    with open(path, "rb") as f:
+        head = f.read(32)
+        try:
+            if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", head[6:10])
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return _webp_size(head)
+            if head[:2] == b"\xff\xd8":
+                f.seek(2)
+                return _jpeg_size(f)
+        except struct.error:
+            return None
+    return None
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        (bits,) = struct.unpack("<I", head[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(f):
+    # Walks the segments up to the first start-of-frame, seeking over the
+    # payloads, so large EXIF blocks are never read.
+    while True:
+        byte = f.read(1)
+        if byte == b"":
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if marker == b"":
+            return None
+        marker = marker[0]
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker == 0xD9:
+            return None
+        (length,) = struct.unpack(">H", f.read(2))
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def recompress_png(data, level=9):
+    """`data` with its image data deflated again at `level`.
+
+    Lossless: the filtered scanlines are kept as they are and only the
+    zlib stream changes. Returns None unless the result is smaller.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    before = []
+    idat = []
+    after = []
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        if offset + 8 > len(data):
+            return None
+        length, chunk_type = struct.unpack(">I4s", data[offset : offset + 8])
+        end = offset + 12 + length
+        if end > len(data):
+            return None
+        if chunk_type == b"IDAT":
+            if after:
+                return None
+            idat.append(data[offset + 8 : end - 4])
+        elif idat:
+            after.append(data[offset:end])
+        else:
+            before.append(data[offset:end])
+        offset = end
+    if not idat:
+        return None
+    old = b"".join(idat)
+    try:
+        new = zlib.compress(zlib.decompress(old), level)
+    except zlib.error:
+        return None
+    if len(new) + 12 >= len(old) + 12 * len(idat):
+        return None
+    chunk = struct.pack(">I", len(new)) + b"IDAT" + new
+    chunk += struct.pack(">I", zlib.crc32(b"IDAT" + new))
+    return PNG_SIGNATURE + b"".join(before) + chunk + b"".join(after)
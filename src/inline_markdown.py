@@ -3,7 +3,90 @@ import re
 from textnode import TextNode, TextType
 
 
+DELIMITER_PATTERN = re.compile(r"\*\*|_|`")
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+inline_parser = "scan"
+
+
+def set_inline_parser(name):
+    global inline_parser
+    if name not in ("scan", "multipass"):
+        raise ValueError(f"unknown inline parser: {name}")
+    inline_parser = name
+
+
 def text_to_textnodes(text):
+    if inline_parser == "multipass":
+        return text_to_textnodes_multipass(text)
+    return scan_inline(text)
+
+
+def scan_inline(text):
+    # Single left-to-right pass producing the same nodes as the multipass
+    # pipeline. That pipeline splits on ** first, then _ inside the plain
+    # sections, then ` inside what is still plain, so a delimiter only
+    # counts when no "outer" delimiter is open. Hitting an outer delimiter
+    # while an inner one is open means the inner section was never closed.
+    nodes = []
+    bold = italic = code = False
+    start = 0
+    for match in DELIMITER_PATTERN.finditer(text):
+        delimiter = match.group()
+        if delimiter == "**":
+            if italic or code:
+                raise ValueError("invalid markdown, formatted section not closed")
+            section_type = TextType.BOLD if bold else TextType.TEXT
+            bold = not bold
+        elif bold:
+            continue
+        elif delimiter == "_":
+            if code:
+                raise ValueError("invalid markdown, formatted section not closed")
+            section_type = TextType.ITALIC if italic else TextType.TEXT
+            italic = not italic
+        elif italic:
+            continue
+        else:
+            section_type = TextType.CODE if code else TextType.TEXT
+            code = not code
+        _append_section(nodes, text[start : match.start()], section_type)
+        start = match.end()
+    if bold or italic or code:
+        raise ValueError("invalid markdown, formatted section not closed")
+    _append_section(nodes, text[start:], TextType.TEXT)
+    return nodes
+
+
+def _append_section(nodes, section, section_type):
+    if section == "":
+        return
+    if section_type != TextType.TEXT:
+        nodes.append(TextNode(section, section_type))
+        return
+    # Images are matched before links, like split_nodes_image running before
+    # split_nodes_link: a link's URL may contain the start of an image.
+    last_index = 0
+    for match in IMAGE_PATTERN.finditer(section):
+        _append_links(nodes, section[last_index : match.start()])
+        nodes.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+        last_index = match.end()
+    _append_links(nodes, section[last_index:])
+
+
+def _append_links(nodes, text):
+    last_index = 0
+    for match in LINK_PATTERN.finditer(text):
+        if match.start() > last_index:
+            nodes.append(TextNode(text[last_index : match.start()], TextType.TEXT))
+        nodes.append(TextNode(match.group(1), TextType.LINK, match.group(2)))
+        last_index = match.end()
+    if last_index < len(text):
+        nodes.append(TextNode(text[last_index:], TextType.TEXT))
+
+
+def text_to_textnodes_multipass(text):
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
     nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
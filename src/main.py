@@ -1,32 +1,469 @@
+import argparse
 import os
 import shutil
 import sys
+import tracemalloc
 
-from copystatic import copy_files_recursive
+from assets import build_asset_map, publish_assets
+from compress import remove_variants
+from copystatic import sync_files
+from daemon import BuildDaemon, serve
 from gencontent import generate_pages_recursive
+from imagemeta import load_image_index
+from manifest import BuildManifest, hash_bytes
+from merge import (
+    SHARD_LINKS,
+    SHARD_ROUTES,
+    SHARD_SEARCH_INDEX,
+    shards_path,
+    write_shard_manifest,
+)
+from parsecache import ParseCache, generator_version
+from profiler import BuildProfile
+from routes import LinkReport, RouteIndex
+from searchindex import SearchIndex
+from template import load_template
+from watch import load_live_template, watch
 
 
 dir_path_static = "./static"
 dir_path_public = "./docs"
 dir_path_content = "./content"
 template_path = "./template.html"
+manifest_path = "./.build/manifest.json"
+trace_path = "./.build/trace.json"
+parse_cache_path = "./.build/parse-cache"
+image_cache_path = "./.build/images.json"
+jinja_cache_path = "./.build/jinja-cache"
+search_index_path = "./.build/search-index.json"
+links_path = "./.build/links.json"
+daemon_socket_path = "./.build/daemon.sock"
 default_basepath = "/"
+NATIVE_ONLY_FLAGS = (
+    "incremental",
+    "watch",
+    "profile",
+    "parse_cache",
+    "async_io",
+    "fingerprint",
+    "gzip",
+    "fragment_cache",
+    "minify",
+    "search_index",
+    "check_links",
+    "shard",
+    "daemon",
+)
+# What the page-by-page rebuilds of --watch and --daemon don't keep up to date.
+FULL_BUILD_FLAGS = ("fingerprint", "minify", "search_index", "check_links", "shard")
 
 
-def main():
-    basepath = default_basepath
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+def parse_shard(value):
+    index, sep, count = value.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected I/N, such as 2/4") from None
+    if sep != "/" or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("expected I/N with 1 <= I <= N")
+    return index, count
 
-    print("Deleting public directory...")
-    if os.path.exists(dir_path_public):
-        shutil.rmtree(dir_path_public)
 
-    print("Copying static files to public directory...")
-    copy_files_recursive(dir_path_static, dir_path_public)
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the site into ./docs")
+    parser.add_argument("basepath", nargs="?", default=default_basepath)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rebuild outputs whose inputs changed since the last build",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for page generation (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static files by content when their mtime differs",
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="hardlink static files into the output instead of copying them",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="serve the output with live reload and rebuild on every change",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8888, help="port to serve on with --watch"
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="show a progress line instead of one line per file",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=trace_path,
+        metavar="TRACE",
+        help=f"time each build stage of each page, write a Chrome trace (default {trace_path})",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        action="store_true",
+        help=f"reuse rendered page bodies from {parse_cache_path} when the source is unchanged",
+    )
+    parser.add_argument(
+        "--parse-cache-size",
+        type=int,
+        default=512,
+        metavar="MB",
+        help="evict least recently used parse cache entries beyond this size",
+    )
+    parser.add_argument(
+        "--async-io",
+        nargs="?",
+        type=int,
+        const=16,
+        metavar="MAX_OPEN",
+        help="overlap reading and writing pages with rendering, at most MAX_OPEN pages in flight (default 16)",
+    )
+    parser.add_argument(
+        "--stream-above",
+        type=int,
+        default=64,
+        metavar="MB",
+        help="stream sources of at least this size through in constant memory (0: always)",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="publish static files under content-hashed names and rewrite references to them",
+    )
+    parser.add_argument(
+        "--gzip",
+        nargs="?",
+        type=int,
+        const=9,
+        metavar="LEVEL",
+        help="write a .gz variant of every compressible output (level 1-9, default 9)",
+    )
+    parser.add_argument(
+        "--no-image-attrs",
+        dest="image_attrs",
+        action="store_false",
+        help="emit bare <img> tags, without sizes read from static/ and lazy loading",
+    )
+    parser.add_argument(
+        "--recompress-png",
+        action="store_true",
+        help="deflate PNG image data again at the highest zlib level when copying",
+    )
+    parser.add_argument(
+        "--fragment-cache",
+        nargs="?",
+        type=int,
+        const=64,
+        metavar="MB",
+        help="reuse the HTML of blocks repeated across pages, within MB per process (default 64)",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="minify pages and the template while they are serialized (pre/code untouched)",
+    )
+    parser.add_argument(
+        "--search-index",
+        action="store_true",
+        help="write a sharded full-text search index to docs/search/, collected while pages are parsed",
+    )
+    parser.add_argument(
+        "--check-links",
+        nargs="?",
+        const="warn",
+        choices=("warn", "error"),
+        help="report links and images in content/ whose target (or #heading) the build doesn't produce; 'error' also fails the build",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="I/N",
+        help=f"build only the I-th of N slices of the pages (balanced by source size) into {shards_path}/I; combine the slices with merge.py",
+    )
+    parser.add_argument(
+        "--daemon",
+        nargs="?",
+        const=daemon_socket_path,
+        metavar="SOCKET",
+        help=f"after building, stay resident and take rebuild/render requests from client.py on a Unix socket (default {daemon_socket_path})",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("native", "jinja"),
+        default="native",
+        help="page generator: the built-in markdown parser, or jinja2 and markdown",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs must be >= 0")
+    if args.async_io is not None and args.async_io < 1:
+        parser.error("--async-io must be >= 1")
+    if args.backend == "jinja":
+        for flag in NATIVE_ONLY_FLAGS:
+            if getattr(args, flag) not in (None, False):
+                option = "--" + flag.replace("_", "-")
+                parser.error(f"{option} is only supported by the native backend")
+    if args.watch and args.daemon:
+        parser.error("--watch can't be combined with --daemon")
+    for mode in ("watch", "daemon"):
+        if not getattr(args, mode):
+            continue
+        for flag in FULL_BUILD_FLAGS:
+            if getattr(args, flag) not in (None, False):
+                option = "--" + flag.replace("_", "-")
+                parser.error(f"{option} can't be combined with --{mode}")
+    if args.shard is not None and args.incremental:
+        parser.error("--shard can't be combined with --incremental")
+    if args.gzip is not None and not 1 <= args.gzip <= 9:
+        parser.error("--gzip level must be between 1 and 9")
+    if args.stream_above < 0:
+        parser.error("--stream-above must be >= 0")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    basepath = args.basepath
+
+    assets = None
+    if args.fingerprint:
+        assets = build_asset_map(dir_path_static)
+    images = None
+    if args.image_attrs:
+        images = load_image_index(dir_path_static, image_cache_path)
+    if args.watch:
+        template = load_live_template(template_path, basepath)
+    else:
+        template = load_template(template_path, basepath, assets, args.minify)
+
+    # Digests of everything every page depends on.
+    compiled = "\0".join(template.parts).encode("utf-8")
+    inputs = {
+        "template": hash_bytes(compiled),
+        "basepath": hash_bytes(basepath.encode("utf-8")),
+        # The generator's own code, so upgrading it rebuilds every page.
+        "generator": generator_version(),
+    }
+    if assets is not None:
+        inputs["assets"] = assets.digest
+    if images is not None:
+        inputs["images"] = images.digest
+    if args.minify:
+        inputs["minify"] = "1"
+    # Pages that didn't change still need (or lose) their .gz.
+    if args.gzip is not None:
+        inputs["gzip"] = str(args.gzip)
+
+    dest_dir_path = dir_path_public
+    shard_dir_path = None
+    if args.shard is not None:
+        shard_dir_path = os.path.join(shards_path, str(args.shard[0]))
+        dest_dir_path = os.path.join(shard_dir_path, "docs")
+
+    manifest = None
+    if args.incremental:
+        manifest = BuildManifest.load(manifest_path)
+        for name, digest in inputs.items():
+            manifest.set_input(name, digest)
+    else:
+        print("Deleting public directory...")
+        output_path = shard_dir_path or dest_dir_path
+        if os.path.exists(output_path):
+            shutil.rmtree(output_path)
+
+    routes = None
+    if args.check_links:
+        routes = RouteIndex(dest_dir_path)
+
+    if args.shard is not None and args.shard[0] != 1:
+        print("Static files are published by shard 1")
+    elif assets is not None:
+        print("Copying static files to public directory...")
+        publish_assets(
+            assets,
+            dest_dir_path,
+            manifest,
+            args.quiet,
+            args.gzip,
+            args.recompress_png,
+            routes,
+        )
+    else:
+        print("Copying static files to public directory...")
+        sync_files(
+            dir_path_static,
+            dest_dir_path,
+            manifest,
+            checksum=args.checksum,
+            hardlink=args.hardlink,
+            quiet=args.quiet,
+            gzip_level=args.gzip,
+            recompress_pngs=args.recompress_png,
+            routes=routes,
+        )
 
     print("Generating content...")
-    generate_pages_recursive(dir_path_content, template_path, dir_path_public, basepath)
+    if args.backend == "jinja":
+        # Imported here so the native backend works without jinja2 and
+        # markdown installed.
+        import generate_pages_recursive as jinja_backend
+
+        jinja_backend.generate_pages_recursive(
+            dir_path_content,
+            template_path,
+            dest_dir_path,
+            basepath,
+            jobs=args.jobs,
+            bytecode_cache_dir=jinja_cache_path,
+            quiet=args.quiet,
+            images=images,
+        )
+        return
+
+    cache = None
+    if args.parse_cache:
+        cache = ParseCache(parse_cache_path, args.parse_cache_size * 2**20)
+    profiler = None
+    if args.profile:
+        profiler = BuildProfile()
+        tracemalloc.start()
+    fragment_cache_size = None
+    if args.fragment_cache is not None:
+        fragment_cache_size = args.fragment_cache * 2**20
+    search_index = None
+    if args.search_index:
+        # An incremental build only re-collects the terms of rebuilt pages.
+        if args.incremental:
+            search_index = SearchIndex.load(search_index_path)
+        elif shard_dir_path is not None:
+            search_index = SearchIndex(
+                os.path.join(shard_dir_path, SHARD_SEARCH_INDEX)
+            )
+        else:
+            search_index = SearchIndex(search_index_path)
+    link_report = None
+    if routes is not None:
+        if args.incremental:
+            link_report = LinkReport.load(links_path, routes)
+        elif shard_dir_path is not None:
+            link_report = LinkReport(os.path.join(shard_dir_path, SHARD_LINKS), routes)
+        else:
+            link_report = LinkReport(links_path, routes)
+    fragment_stats = generate_pages_recursive(
+        dir_path_content,
+        template_path,
+        dest_dir_path,
+        basepath,
+        manifest=manifest,
+        jobs=args.jobs,
+        template=template,
+        quiet=args.quiet,
+        profiler=profiler,
+        cache=cache,
+        max_open=args.async_io,
+        stream_above=args.stream_above * 2**20,
+        assets=assets,
+        gzip_level=args.gzip,
+        images=images,
+        fragment_cache_size=fragment_cache_size,
+        minify=args.minify,
+        search_index=search_index,
+        link_report=link_report,
+        shard=args.shard,
+    )
+    if fragment_stats is not None:
+        print(fragment_stats.summary())
+    # A shard's indexes only cover its pages; merge.py writes and checks
+    # the combined ones.
+    if search_index is not None and shard_dir_path is not None:
+        search_index.save()
+    elif search_index is not None:
+        shards = search_index.write(dest_dir_path)
+        search_index.save()
+        pages, shard_count = len(search_index.pages), len(shards) - 1
+        print(f"Search index: {pages} pages, {shard_count} shards")
+    if cache is not None:
+        cache.prune()
+
+    if profiler is not None:
+        tracemalloc.stop()
+        os.makedirs(os.path.dirname(os.path.abspath(args.profile)), exist_ok=True)
+        profiler.write_trace(args.profile)
+        print(profiler.summary())
+        print(f"Trace written to {args.profile}")
+
+    dead_links = []
+    if link_report is not None and shard_dir_path is not None:
+        link_report.save()
+        routes.save(os.path.join(shard_dir_path, SHARD_ROUTES))
+    elif link_report is not None:
+        dead_links = link_report.dead_links()
+        link_report.save()
+        for source, url, reason in dead_links:
+            print(f" * dead link in {source}: {url} ({reason})")
+        print(f"Link check: {len(dead_links)} dead links")
+
+    if manifest is not None:
+        for dest in manifest.remove_stale_outputs(dir_path_public):
+            print(f" * removed {dest}")
+        if args.gzip is None and "gzip" in manifest.previous["inputs"]:
+            for dest in remove_variants(manifest.outputs()):
+                print(f" * removed {dest}")
+        manifest.save()
+    if shard_dir_path is not None:
+        write_shard_manifest(shard_dir_path, args.shard, inputs)
+    if dead_links and args.check_links == "error":
+        sys.exit(1)
+
+    if args.daemon:
+        daemon = BuildDaemon(
+            dir_path_content,
+            dir_path_static,
+            template_path,
+            dir_path_public,
+            basepath,
+            template,
+            image_cache_path if args.image_attrs else None,
+            gzip_level=args.gzip,
+            checksum=args.checksum,
+            hardlink=args.hardlink,
+            recompress_pngs=args.recompress_png,
+        )
+        serve(daemon, args.daemon)
+
+    if args.watch:
+        watch(
+            dir_path_content,
+            dir_path_static,
+            template_path,
+            dir_path_public,
+            basepath,
+            args.port,
+            image_cache_path=image_cache_path if args.image_attrs else None,
+            gzip_level=args.gzip,
+            checksum=args.checksum,
+            hardlink=args.hardlink,
+            recompress_pngs=args.recompress_png,
+        )
 
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import contextlib
+import hashlib
+import json
+import os
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """Open a temporary file next to `path` that replaces it once closed.
+
+    Readers never see a partly written `path`, and the temporary file is
+    removed if writing it fails.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class BuildManifest:
+    """Content hashes of every build input, persisted between runs.
+
+    `previous` is what the last build recorded, `current` is filled in as
+    this build goes. Pages also depend on the global inputs (template and
+    basepath), so a change to any of those makes every page stale.
+
+    A page's "hash" is the SHA-256 of its source. Static files are synced
+    by comparing stats instead (see sync_files), so theirs is the source's
+    "size:mtime_ns", or its asset path with --fingerprint, with
+    ":recompressed" appended for recompressed PNGs.
+    """
+
+    def __init__(self, path, previous=None):
+        self.path = path
+        self.previous = previous or _empty_manifest()
+        self.current = _empty_manifest()
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r") as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data)
+
+    def save(self):
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump(self.current, f, indent=1, sort_keys=True)
+
+    def set_input(self, name, digest):
+        self.current["inputs"][name] = digest
+
+    def inputs_changed(self):
+        return self.previous["inputs"] != self.current["inputs"]
+
+    def is_fresh(self, section, source, digest, dest):
+        if section == "pages" and self.inputs_changed():
+            return False
+        entry = self.previous[section].get(source)
+        if entry is None:
+            return False
+        if entry["hash"] != digest or entry["dest"] != dest:
+            return False
+        return os.path.exists(dest)
+
+    def record(self, section, source, digest, dest):
+        self.current[section][source] = {"hash": digest, "dest": dest}
+
+    def outputs(self):
+        return [
+            entry["dest"]
+            for section in ("pages", "static")
+            for entry in self.current[section].values()
+        ]
+
+    def stale_outputs(self):
+        stale = []
+        for section in ("pages", "static"):
+            live = {entry["dest"] for entry in self.current[section].values()}
+            for entry in self.previous[section].values():
+                if entry["dest"] not in live:
+                    stale.append(entry["dest"])
+        return stale
+
+    def remove_stale_outputs(self, root):
+        removed = []
+        for dest in self.stale_outputs():
+            if not os.path.isfile(dest):
+                continue
+            os.remove(dest)
+            removed.append(dest)
+            if os.path.isfile(dest + ".gz"):
+                os.remove(dest + ".gz")
+            _prune_empty_dirs(os.path.dirname(dest), root)
+        return removed
+
+
+def _empty_manifest():
+    return {"version": MANIFEST_VERSION, "inputs": {}, "pages": {}, "static": {}}
+
+
+def _prune_empty_dirs(dir_path, root):
+    root = os.path.abspath(root)
+    dir_path = os.path.abspath(dir_path)
+    while dir_path != root and dir_path.startswith(root + os.sep):
+        if os.listdir(dir_path):
+            return
+        os.rmdir(dir_path)
+        dir_path = os.path.dirname(dir_path)
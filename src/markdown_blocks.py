@@ -1,10 +1,14 @@
+import re
 from enum import Enum
 
-from htmlnode import ParentNode
+from htmlnode import ParentNode, RawHTMLNode
 from inline_markdown import text_to_textnodes
 from textnode import text_node_to_html_node, TextNode, TextType
 
 
+HEADING_ID_EXCLUDED = re.compile(r"[^\w\- ]")
+
+
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
     HEADING = "heading"
@@ -15,34 +19,81 @@ class BlockType(Enum):
 
 
 def markdown_to_blocks(markdown):
-    blocks = markdown.split("\n\n")
-    filtered_blocks = []
-    for block in blocks:
-        if block == "":
+    return ["\n".join(lines) for _, _, lines in scan_blocks(markdown)]
+
+
+def scan_blocks(markdown):
+    return iter_blocks(markdown.split("\n"))
+
+
+def iter_blocks(lines, first_lineno=0, fences=True):
+    """Walk the lines once, yielding (block_type, start, lines) records.
+
+    `start` is the index of the block's first line. Blocks are separated by
+    blank lines, except inside a ``` fence, which runs to the next line
+    starting with ``` and may contain blank lines. The block's first line
+    is left-stripped and its last line right-stripped.
+    """
+    block = []
+    start = first_lineno
+    fence = None
+    for lineno, line in enumerate(lines, first_lineno):
+        if fence is not None:
+            fence.append(line)
+            if line.startswith("```"):
+                yield BlockType.CODE, start, fence
+                fence = None
+            continue
+        if line == "" or line.isspace():
+            if block:
+                yield _close_block(start, block)
+                block = []
             continue
-        block = block.strip()
-        filtered_blocks.append(block)
-    return filtered_blocks
+        if not block:
+            start = lineno
+            line = line.lstrip()
+            if fences and is_fence_opener(line):
+                fence = [line]
+                continue
+        block.append(line)
+    if fence is not None:
+        # Never closed: no later line starts with ```, so scanning the rest
+        # again without fences is the same as never having opened one.
+        yield from iter_blocks(fence, start, fences=False)
+    if block:
+        yield _close_block(start, block)
+
+
+def is_fence_opener(line):
+    return line.startswith("```") and "```" not in line[3:]
+
+
+def _close_block(start, lines):
+    lines[-1] = lines[-1].rstrip()
+    return lines_to_block_type(lines), start, lines
 
 
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+
+def lines_to_block_type(lines):
+    first = lines[0]
+    if first.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
         return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and lines[-1].startswith("```"):
         return BlockType.CODE
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH
         return BlockType.QUOTE
-    if block.startswith("- "):
+    if first.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH
         return BlockType.ULIST
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -52,49 +103,118 @@ def block_to_block_type(block):
     return BlockType.PARAGRAPH
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+class HeadingIds:
+    """The heading IDs given out on one page, each one unique.
+
+    As on GitHub, repeats of an ID get "-1", "-2", ... appended, skipping
+    any that a heading already took.
+    """
+
+    def __init__(self):
+        self.ids = set()
+        self.counts = {}
+
+    def add(self, heading_id):
+        count = self.counts.get(heading_id, 0)
+        unique_id = heading_id if count == 0 else f"{heading_id}-{count}"
+        while unique_id in self.ids:
+            count += 1
+            unique_id = f"{heading_id}-{count}"
+        self.counts[heading_id] = count + 1
+        self.ids.add(unique_id)
+        return unique_id
+
+
+def markdown_to_html_node(markdown, context=None):
+    return blocks_to_html_node(scan_blocks(markdown), context)
+
+
+def blocks_to_html_node(blocks, context=None):
+    heading_ids = HeadingIds() if context is None else context.heading_ids
     children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
+    for block_type, _, lines in blocks:
+        children.append(convert_block(block_type, lines, context, heading_ids))
     return ParentNode("div", children, None)
 
 
+def iter_blocks_html(blocks, context=None):
+    """Yield the HTML of blocks_to_html_node(blocks) one block at a time.
+
+    Only the block being converted is held as a tree, so with a lazy
+    `blocks` iterator memory doesn't grow with the document.
+    """
+    minify = context is not None and context.minify
+    heading_ids = HeadingIds() if context is None else context.heading_ids
+    yield "<div>"
+    for block_type, _, lines in blocks:
+        node = convert_block(block_type, lines, context, heading_ids)
+        yield from node.iter_html(minify)
+    yield "</div>"
+
+
+def convert_block(block_type, lines, context=None, heading_ids=None):
+    # With a fragment cache on the context, a block that was already
+    # rendered (on this page or another) comes back as a raw HTML node,
+    # and what its conversion collected (search terms, links) is replayed.
+    # Headings aren't cached: their IDs depend on the rest of the page.
+    fragments = None if context is None else context.fragments
+    if fragments is None or block_type == BlockType.HEADING:
+        return lines_to_html_node(block_type, lines, context, heading_ids)
+    key = fragments.key(context.cache_key(), block_type, lines)
+    entry = fragments.get(key)
+    if entry is not None:
+        html, record = entry
+        context.replay(record)
+        return RawHTMLNode(html)
+    page = context.capture()
+    try:
+        html = lines_to_html_node(block_type, lines, context).to_html(context.minify)
+    finally:
+        record = context.release(page)
+    fragments.put(key, html, record)
+    return RawHTMLNode(html)
+
+
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    return lines_to_html_node(block_to_block_type(block), block.split("\n"))
+
+
+def lines_to_html_node(block_type, lines, context=None, heading_ids=None):
     if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
+        return paragraph_to_html_node(lines, context)
     if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
+        return heading_to_html_node(lines, context, heading_ids)
     if block_type == BlockType.CODE:
-        return code_to_html_node(block)
+        return code_to_html_node(lines)
     if block_type == BlockType.OLIST:
-        return olist_to_html_node(block)
+        return olist_to_html_node(lines, context)
     if block_type == BlockType.ULIST:
-        return ulist_to_html_node(block)
+        return ulist_to_html_node(lines, context)
     if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
+        return quote_to_html_node(lines, context)
     raise ValueError("invalid block type")
 
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
+def text_to_children(text, context=None):
+    if context is None:
+        text_nodes = text_to_textnodes(text)
+    else:
+        text_nodes = context.text_to_textnodes(text)
     children = []
     for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
+        html_node = text_node_to_html_node(text_node, context)
         children.append(html_node)
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines, context=None):
     paragraph = " ".join(lines)
-    children = text_to_children(paragraph)
+    children = text_to_children(paragraph, context)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
+def heading_to_html_node(lines, context=None, heading_ids=None):
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -104,47 +224,56 @@ def heading_to_html_node(block):
     if level + 1 >= len(block):
         raise ValueError(f"invalid heading level: {level}")
     text = block[level + 1 :]
-    children = text_to_children(text)
-    return ParentNode(f"h{level}", children)
+    children = text_to_children(text, context)
+    heading_id = make_heading_id("".join(child.value or "" for child in children))
+    if heading_id == "":
+        return ParentNode(f"h{level}", children)
+    if heading_ids is not None:
+        heading_id = heading_ids.add(heading_id)
+    if context is not None:
+        context.add_heading(heading_id)
+    return ParentNode(f"h{level}", children, (("id", heading_id),))
+
+
+def make_heading_id(text):
+    # GitHub's anchors: lowercase, punctuation dropped, spaces as hyphens.
+    return HEADING_ID_EXCLUDED.sub("", text.lower()).strip().replace(" ", "-")
 
 
-def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def code_to_html_node(lines):
+    if len(lines) < 2 or not lines[0].startswith("```") or not lines[-1].startswith("```"):
         raise ValueError("invalid code block")
-    text = block[4:-3]
+    text = "".join([line + "\n" for line in lines[1:-1]])
     raw_text_node = TextNode(text, TextType.TEXT)
     child = text_node_to_html_node(raw_text_node)
     code = ParentNode("code", [child])
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def olist_to_html_node(lines, context=None):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[3:]
-        children = text_to_children(text)
+        children = text_to_children(text, context)
         html_items.append(ParentNode("li", children))
     return ParentNode("ol", html_items)
 
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(lines, context=None):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:]
-        children = text_to_children(text)
+        children = text_to_children(text, context)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines, context=None):
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
             raise ValueError("invalid quote block")
         new_lines.append(line.lstrip(">").strip())
     content = " ".join(new_lines)
-    children = text_to_children(content)
+    children = text_to_children(content, context)
     return ParentNode("blockquote", children)
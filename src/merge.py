@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+
+from copystatic import copy_file
+from routes import LinkReport, RouteIndex
+from searchindex import SearchIndex
+
+
+shards_path = "./.build/shards"
+SHARD_MANIFEST_VERSION = 1
+# Written by `main.py --shard I/N` into <shard_dir>, next to docs/.
+SHARD_MANIFEST = "manifest.json"
+SHARD_SEARCH_INDEX = "search-index.json"
+SHARD_LINKS = "links.json"
+SHARD_ROUTES = "routes.json"
+
+
+class MergeError(Exception):
+    pass
+
+
+def write_shard_manifest(shard_dir_path, shard, inputs):
+    """Record what shard (index, count) built: its inputs and every output.
+
+    `inputs` are the build-wide digests (template, basepath, ...), which
+    every shard of one build must agree on.
+    """
+    dest_dir_path = os.path.join(shard_dir_path, "docs")
+    outputs = []
+    for dir_path, _, file_names in os.walk(dest_dir_path):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            outputs.append(os.path.relpath(path, dest_dir_path).replace(os.sep, "/"))
+    data = {
+        "version": SHARD_MANIFEST_VERSION,
+        "shard": list(shard),
+        "inputs": inputs,
+        "outputs": sorted(outputs),
+    }
+    with open(os.path.join(shard_dir_path, SHARD_MANIFEST), "w") as f:
+        json.dump(data, f, sort_keys=True)
+
+
+def load_shard_manifest(shard_dir_path):
+    try:
+        with open(os.path.join(shard_dir_path, SHARD_MANIFEST), "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        raise MergeError(f"{shard_dir_path}: no shard manifest ({e})") from e
+    if data.get("version") != SHARD_MANIFEST_VERSION:
+        raise MergeError(f"{shard_dir_path}: unsupported shard manifest")
+    return data
+
+
+def merge_shards(shard_dir_paths, dest_dir_path, quiet=False):
+    """Combine the outputs of every shard of a build into dest_dir_path.
+
+    The shards must be exactly 1..N of one N, built from the same inputs,
+    and no output path may come from more than one of them; otherwise
+    MergeError is raised before dest_dir_path is touched. Shard search
+    indexes are merged and written to dest_dir_path/search/. Returns the
+    LinkReport of the whole site when the shards recorded links, else None.
+    """
+    manifests = [load_shard_manifest(path) for path in shard_dir_paths]
+    if not manifests:
+        raise MergeError("no shards to merge")
+    count = manifests[0]["shard"][1]
+    indexes = sorted(manifest["shard"][0] for manifest in manifests)
+    if indexes != list(range(1, count + 1)) or any(
+        manifest["shard"][1] != count for manifest in manifests
+    ):
+        found = ", ".join(f"{i}/{n}" for i, n in (m["shard"] for m in manifests))
+        raise MergeError(f"expected shards 1/{count} to {count}/{count}, got {found}")
+    for path, manifest in zip(shard_dir_paths, manifests):
+        if manifest["inputs"] != manifests[0]["inputs"]:
+            raise MergeError(
+                f"{path} was built from other inputs than {shard_dir_paths[0]}"
+            )
+
+    owners = {}
+    duplicates = []
+    for path, manifest in zip(shard_dir_paths, manifests):
+        for rel_path in manifest["outputs"]:
+            owner = owners.setdefault(rel_path, path)
+            if owner != path:
+                duplicates.append(f"{rel_path} (in {owner} and {path})")
+    if duplicates:
+        raise MergeError("produced twice: " + ", ".join(sorted(duplicates)))
+
+    has_search = [_has(path, SHARD_SEARCH_INDEX) for path in shard_dir_paths]
+    has_links = [_has(path, SHARD_LINKS) for path in shard_dir_paths]
+    for name, flags in (("search index", has_search), ("links", has_links)):
+        if any(flags) and not all(flags):
+            raise MergeError(f"only some shards recorded {name}")
+
+    if os.path.exists(dest_dir_path):
+        shutil.rmtree(dest_dir_path)
+    made_dirs = set()
+    for rel_path, path in sorted(owners.items()):
+        dest_path = os.path.join(dest_dir_path, *rel_path.split("/"))
+        dest_parent = os.path.dirname(dest_path)
+        if dest_parent not in made_dirs:
+            os.makedirs(dest_parent, exist_ok=True)
+            made_dirs.add(dest_parent)
+        copy_file(os.path.join(path, "docs", *rel_path.split("/")), dest_path)
+    if not quiet:
+        print(f"Merged {len(owners)} files from {len(manifests)} shards")
+
+    if all(has_search):
+        search_index = SearchIndex(None)
+        for path in shard_dir_paths:
+            shard_index = SearchIndex.load(os.path.join(path, SHARD_SEARCH_INDEX))
+            search_index.pages.update(shard_index.pages)
+        search_index.write(dest_dir_path)
+    if not all(has_links):
+        return None
+    routes = RouteIndex(dest_dir_path)
+    link_report = LinkReport(None, routes)
+    for path in shard_dir_paths:
+        with open(os.path.join(path, SHARD_ROUTES), "r") as f:
+            routes.routes.update(json.load(f))
+        shard_links = LinkReport.load(os.path.join(path, SHARD_LINKS), routes)
+        link_report.pages.update(shard_links.pages)
+    return link_report
+
+
+def _has(shard_dir_path, name):
+    return os.path.exists(os.path.join(shard_dir_path, name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge the outputs of `main.py --shard I/N` builds into ./docs"
+    )
+    parser.add_argument(
+        "shards",
+        nargs="*",
+        metavar="SHARD_DIR",
+        help=f"shard output directories (default: every directory in {shards_path})",
+    )
+    parser.add_argument("--dest", default="./docs", help="merged output directory")
+    parser.add_argument(
+        "--check-links",
+        nargs="?",
+        const="warn",
+        choices=("warn", "error"),
+        help="report dead links recorded by the shards; 'error' also fails the merge",
+    )
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    shard_dir_paths = args.shards
+    if not shard_dir_paths and os.path.isdir(shards_path):
+        names = sorted(os.listdir(shards_path))
+        shard_dir_paths = [os.path.join(shards_path, name) for name in names]
+
+    try:
+        link_report = merge_shards(shard_dir_paths, args.dest, args.quiet)
+    except MergeError as e:
+        sys.exit(f"merge failed: {e}")
+    if args.check_links is None:
+        return
+    if link_report is None:
+        sys.exit("merge failed: the shards were built without --check-links")
+    dead_links = link_report.dead_links()
+    for source, url, reason in dead_links:
+        print(f" * dead link in {source}: {url} ({reason})")
+    print(f"Link check: {len(dead_links)} dead links")
+    if dead_links and args.check_links == "error":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import re
+
+
+WHITESPACE_RUN = re.compile(r"\s+")
+# Attribute values made only of these characters need no quotes.
+UNQUOTED_VALUE = re.compile(r"[^\s\"'=<>`]+")
+QUOTED_ATTRIBUTE = re.compile(r"""(\s[^\s"'=<>/]+)="([^"]*)\"""")
+TOKEN_PATTERN = re.compile(r"<!--.*?-->|<![^>]*>|<(/?)([A-Za-z][\w:-]*)[^>]*>", re.S)
+
+# Elements whose content is kept exactly as it is.
+RAW_TAGS = frozenset(("code", "pre", "script", "style", "textarea"))
+VOID_TAGS = frozenset(
+    (
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "source",
+        "track",
+        "wbr",
+    )
+)
+# Whitespace next to these never renders, so it can go entirely; next to
+# other (inline) elements it still separates words and is kept as one space.
+BLOCK_TAGS = frozenset(
+    (
+        "article",
+        "aside",
+        "blockquote",
+        "body",
+        "div",
+        "footer",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "head",
+        "header",
+        "hr",
+        "html",
+        "li",
+        "link",
+        "main",
+        "meta",
+        "nav",
+        "ol",
+        "p",
+        "pre",
+        "script",
+        "section",
+        "style",
+        "table",
+        "tbody",
+        "td",
+        "th",
+        "thead",
+        "title",
+        "tr",
+        "ul",
+    )
+)
+
+
+def collapse_whitespace(text):
+    return WHITESPACE_RUN.sub(" ", text)
+
+
+def attribute_html(name, value):
+    if value and UNQUOTED_VALUE.fullmatch(value):
+        return f" {name}={value}"
+    return f' {name}="{value}"'
+
+
+def minify_html(html):
+    """Minify an HTML document, such as a page template.
+
+    Comments are dropped, whitespace between tags is collapsed or removed
+    and attribute quotes are dropped where they're optional. The content
+    of raw elements (pre, code, script, style, textarea) is left alone.
+    Text, including a template's slot markers, is treated as inline.
+    """
+    out = []
+    text_start = 0
+    left_is_block = False
+    pos = 0
+    while True:
+        match = TOKEN_PATTERN.search(html, pos)
+        if match is None:
+            out.append(_minify_text(html[text_start:], left_is_block, False))
+            return "".join(out)
+        token = match.group(0)
+        tag = (match.group(2) or "").lower()
+        is_block = tag in BLOCK_TAGS or match.group(2) is None
+        text = html[text_start : match.start()]
+        out.append(_minify_text(text, left_is_block, is_block))
+        pos = match.end()
+        if token.startswith("<!--"):
+            if token.startswith("<!--[if"):
+                out.append(token)
+        elif token.startswith("<!"):
+            out.append(token)
+        else:
+            out.append(QUOTED_ATTRIBUTE.sub(_unquote, token))
+            if not match.group(1) and tag in RAW_TAGS:
+                close = re.compile(f"</{tag}\\s*>", re.I).search(html, pos)
+                end = len(html) if close is None else close.start()
+                out.append(html[pos:end])
+                pos = end
+        text_start = pos
+        left_is_block = is_block
+
+
+def _minify_text(text, left_is_block, right_is_block):
+    if text == "":
+        return ""
+    text = collapse_whitespace(text)
+    if left_is_block:
+        text = text.lstrip(" ")
+    if right_is_block:
+        text = text.rstrip(" ")
+    return text
+
+
+def _unquote(match):
+    separator, name = match.group(1)[0], match.group(1)[1:]
+    return separator + attribute_html(name, match.group(2))[1:]
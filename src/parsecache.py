@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+from manifest import atomic_write
+
+
+# Rough per-entry cost of a MemoryParseCache entry besides its text.
+ENTRY_OVERHEAD = 256
+
+# Modules whose code decides what a markdown file renders to. Any change to
+# them invalidates every cache entry.
+PARSER_MODULES = (
+    "assets.py",
+    "htmlnode.py",
+    "imagemeta.py",
+    "inline_markdown.py",
+    "markdown_blocks.py",
+    "minify.py",
+    "parsecache.py",
+    "rendercontext.py",
+    "routes.py",
+    "searchindex.py",
+    "textnode.py",
+)
+# Modules that turn a rendered body into the page written out.
+PAGE_MODULES = ("gencontent.py", "template.py")
+
+
+@lru_cache(maxsize=None)
+def parser_version():
+    return _hash_modules(PARSER_MODULES)
+
+
+@lru_cache(maxsize=None)
+def generator_version():
+    # What pages of an incremental build depend on besides their inputs.
+    return _hash_modules(PARSER_MODULES + PAGE_MODULES)
+
+
+def _hash_modules(names):
+    digest = hashlib.sha256()
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in names:
+        with open(os.path.join(src_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ParseCache:
+    """Rendered page bodies on disk, keyed by source hash and parser version.
+
+    Each entry is one zlib-compressed file holding the page title, what
+    rendering it collected (RenderContext.record as JSON, or empty) and
+    the body HTML.
+    A hit refreshes the file's mtime; prune() evicts the least
+    recently used entries once the cache grows past max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=512 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def key(self, markdown, context_key):
+        digest = hashlib.sha256()
+        digest.update(parser_version().encode("ascii"))
+        digest.update(b"\0" + context_key.encode("utf-8") + b"\0")
+        digest.update(markdown.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                data = zlib.decompress(f.read())
+        except (FileNotFoundError, zlib.error):
+            return None
+        os.utime(entry_path)
+        title_size, record_size = struct.unpack_from(">II", data)
+        record_start = 8 + title_size
+        html_start = record_start + record_size
+        title = data[8:record_start].decode("utf-8")
+        record = json.loads(data[record_start:html_start]) if record_size else None
+        html = data[html_start:].decode("utf-8")
+        return title, html, record
+
+    def put(self, key, title, html, record=None):
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        title_bytes = title.encode("utf-8")
+        record_bytes = b"" if record is None else json.dumps(record).encode("utf-8")
+        data = (
+            struct.pack(">II", len(title_bytes), len(record_bytes))
+            + title_bytes
+            + record_bytes
+            + html.encode("utf-8")
+        )
+        with atomic_write(entry_path, "wb") as f:
+            f.write(zlib.compress(data, 6))
+
+    def prune(self):
+        if not os.path.isdir(self.path):
+            return 0
+        entries = []
+        total = 0
+        for dir_entry in os.scandir(self.path):
+            if not dir_entry.is_dir():
+                continue
+            for entry in os.scandir(dir_entry.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+
+class MemoryParseCache:
+    """A ParseCache held in memory, for a process that builds many times.
+
+    Same keys and entries as ParseCache; the least recently used entries
+    are evicted beyond max_bytes.
+    """
+
+    key = ParseCache.key
+
+    def __init__(self, max_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, title, html, record=None):
+        if key in self.entries:
+            return
+        self.entries[key] = (title, html, record)
+        self.size += _memory_entry_size(title, html)
+        while self.size > self.max_bytes and self.entries:
+            _, (title, html, _) = self.entries.popitem(last=False)
+            self.size -= _memory_entry_size(title, html)
+
+
+def _memory_entry_size(title, html):
+    return len(title) + len(html) + ENTRY_OVERHEAD
@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+STAGES = (
+    "read",
+    "block_split",
+    "inline_parse",
+    "html_tree",
+    "serialize",
+    "template_fill",
+    "write",
+)
+
+
+class PageProfile:
+    """Wall time and allocated bytes of each build stage of one page.
+
+    Bytes are the tracemalloc high-water mark reached during the stage,
+    over what was allocated when it started. inline_parse runs in many
+    small pieces inside html_tree, so only its total time is recorded and
+    it is included in html_tree's numbers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = dict.fromkeys(STAGES, 0)
+        self._inline_ns = 0
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            allocated = 0
+            if tracing:
+                allocated = max(0, tracemalloc.get_traced_memory()[1] - start_bytes)
+            self.events.append((name, start, duration, allocated))
+            self.seconds[name] += duration / 1e9
+            self.bytes[name] += allocated
+
+    @contextmanager
+    def inline(self):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._inline_ns += time.perf_counter_ns() - start
+
+    def finish(self):
+        self.seconds["inline_parse"] = self._inline_ns / 1e9
+        for name, start, _, _ in self.events:
+            if name == "html_tree":
+                self.events.append(("inline_parse", start, self._inline_ns, 0))
+                break
+
+    @property
+    def total_seconds(self):
+        return sum(
+            seconds for name, seconds in self.seconds.items() if name != "inline_parse"
+        )
+
+
+class BuildProfile:
+    def __init__(self):
+        self.pages = []
+
+    def add(self, page):
+        self.pages.append(page)
+
+    def write_trace(self, path):
+        # Chrome trace-event format: open in chrome://tracing or Perfetto.
+        events = []
+        for page in self.pages:
+            for name, start, duration, allocated in page.events:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "stage",
+                        "ph": "X",
+                        "ts": start / 1000,
+                        "dur": duration / 1000,
+                        "pid": page.pid,
+                        "tid": page.pid,
+                        "args": {"page": page.path, "bytes": allocated},
+                    }
+                )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, top=10):
+        lines = []
+        totals = dict.fromkeys(STAGES, 0.0)
+        for page in self.pages:
+            for name in STAGES:
+                totals[name] += page.seconds[name]
+        lines.append(f"{len(self.pages)} pages profiled, time per stage:")
+        for name in STAGES:
+            lines.append(f"  {name:<14} {totals[name] * 1000:10.1f} ms")
+        slowest = sorted(self.pages, key=lambda page: page.total_seconds, reverse=True)
+        lines.append(f"slowest {min(top, len(slowest))} pages:")
+        for page in slowest[:top]:
+            worst = max(STAGES, key=lambda name: page.seconds[name])
+            lines.append(
+                f"  {page.total_seconds * 1000:8.1f} ms  {page.path}"
+                f"  (mostly {worst}, peak {max(page.bytes.values()) / 1024:.0f} KiB)"
+            )
+        return "\n".join(lines)
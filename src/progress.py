@@ -0,0 +1,34 @@
+import sys
+import time
+
+
+class Progress:
+    """Reports finished files, one line each or as a single status line.
+
+    In quiet mode the status line is redrawn at most ten times a second,
+    instead of a terminal write per file.
+    """
+
+    def __init__(self, label, total, quiet=False, stream=None):
+        self.label = label
+        self.total = total
+        self.quiet = quiet
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self._last_draw = 0.0
+
+    def advance(self, message):
+        self.done += 1
+        if not self.quiet:
+            print(message, file=self.stream)
+            return
+        now = time.monotonic()
+        if now - self._last_draw >= 0.1 or self.done == self.total:
+            self._last_draw = now
+            self.stream.write(f"\r{self.label}: {self.done}/{self.total}")
+            self.stream.flush()
+
+    def finish(self):
+        if self.quiet and self.total:
+            self.stream.write("\n")
+            self.stream.flush()
@@ -0,0 +1,126 @@
+from inline_markdown import text_to_textnodes
+from markdown_blocks import HeadingIds
+from routes import PageLinks
+from searchindex import PageTerms
+
+
+class RenderContext:
+    """Per-page state threaded through markdown_to_html_node."""
+
+    def __init__(
+        self,
+        basepath="/",
+        *,
+        profile=None,
+        assets=None,
+        images=None,
+        fragments=None,
+        minify=False,
+        search=None,
+        links=None,
+    ):
+        self.basepath = basepath
+        self.profile = profile
+        self.assets = assets
+        self.images = images
+        self.fragments = fragments
+        self.minify = minify
+        # PageTerms collecting the page's words for the search index.
+        self.search = search
+        # PageLinks collecting the page's URLs and heading IDs.
+        self.links = links
+        # The page's heading IDs so far, to keep them unique.
+        self.heading_ids = HeadingIds()
+
+    def cache_key(self):
+        # Everything besides the markdown itself that changes the rendered
+        # body, for keying cached output.
+        key = self.basepath
+        if self.assets is not None:
+            key += "\0" + self.assets.digest
+        if self.images is not None:
+            key += "\0" + self.images.digest
+        if self.minify:
+            key += "\0minify"
+        if self.search is not None:
+            key += "\0search"
+        if self.links is not None:
+            key += "\0links"
+        return key
+
+    def resolve_url(self, url):
+        # Site-absolute URLs are served from under the basepath; this is done
+        # while building the tree, so the rendered page is never rescanned.
+        if not url.startswith("/"):
+            return url
+        if self.assets is not None:
+            url = self.assets.resolve(url)
+        if self.basepath == "/":
+            return url
+        return self.basepath + url[1:]
+
+    def image_attributes(self, url):
+        # Extra <img> props for the unresolved `url`.
+        if self.images is None:
+            return ()
+        return self.images.attributes(url)
+
+    def text_to_textnodes(self, text):
+        if self.profile is None:
+            text_nodes = text_to_textnodes(text)
+        else:
+            with self.profile.inline():
+                text_nodes = text_to_textnodes(text)
+        if self.search is not None:
+            self.search.add_nodes(text_nodes)
+        return text_nodes
+
+    def check_link(self, url):
+        # `url` as written in the markdown, before resolve_url.
+        if self.links is not None:
+            self.links.urls.append(url)
+
+    def add_heading(self, heading_id):
+        if self.links is not None:
+            self.links.anchors.add(heading_id)
+
+    def record(self):
+        """What the page's collectors hold: (terms, urls, anchors).
+
+        Cached along with rendered HTML and fed back through replay() on a
+        hit, so cached output still reaches the search index and the link
+        check. Parts that aren't collected are None.
+        """
+        terms = urls = anchors = None
+        if self.search is not None:
+            terms = self.search.counts
+        if self.links is not None:
+            urls = self.links.urls
+            anchors = sorted(self.links.anchors)
+        return terms, urls, anchors
+
+    def replay(self, record):
+        terms, urls, anchors = record
+        if self.search is not None:
+            self.search.update(terms)
+        if self.links is not None:
+            self.links.urls.extend(urls)
+            self.links.anchors.update(anchors)
+
+    def capture(self):
+        # Swaps in empty collectors, so one block's record can be taken
+        # with release(); returns the page's collectors.
+        page = (self.search, self.links)
+        if self.search is not None:
+            self.search = PageTerms()
+        if self.links is not None:
+            self.links = PageLinks()
+        return page
+
+    def release(self, page):
+        # Restores the page's collectors with the block's record added to
+        # them, and returns that record.
+        record = self.record()
+        self.search, self.links = page
+        self.replay(record)
+        return record
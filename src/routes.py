@@ -0,0 +1,130 @@
+import json
+import os
+import posixpath
+import re
+from urllib.parse import unquote, urlsplit
+
+from manifest import atomic_write
+
+
+# A scheme ("https:", "mailto:") or a scheme-relative "//host" URL.
+EXTERNAL_URL = re.compile(r"(?:[A-Za-z][A-Za-z0-9+.-]*:|//)")
+REPORT_VERSION = 1
+
+
+class RouteIndex:
+    """Every file the build writes into dest_dir_path, by site-absolute URL.
+
+    `routes` maps each URL to the output's path relative to dest_dir_path.
+    A page's index.html is also reachable as its directory, with or without
+    the trailing slash.
+    """
+
+    def __init__(self, dest_dir_path):
+        self.dest_dir_path = dest_dir_path
+        self.routes = {}
+
+    def rel_path(self, dest_path):
+        return os.path.relpath(dest_path, self.dest_dir_path).replace(os.sep, "/")
+
+    def add(self, dest_path):
+        rel_path = self.rel_path(dest_path)
+        self.add_url("/" + rel_path, rel_path)
+
+    def add_url(self, url, rel_path):
+        self.routes[url] = rel_path
+        if url.endswith("/index.html"):
+            dir_url = url[: -len("index.html")]
+            self.routes[dir_url] = rel_path
+            if dir_url != "/":
+                self.routes[dir_url[:-1]] = rel_path
+
+    def resolve(self, url):
+        return self.routes.get(unquote(url))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.routes, f, sort_keys=True)
+
+
+class PageLinks:
+    """URLs linked from one page and the IDs of its headings."""
+
+    def __init__(self, urls=(), anchors=()):
+        self.urls = list(urls)
+        self.anchors = set(anchors)
+
+
+class LinkReport:
+    """Links and heading IDs of every page, checked against a RouteIndex.
+
+    `pages` maps each source path to [page_path, urls, anchors], with
+    page_path relative to the output directory. It's persisted between
+    builds, so an incremental build still checks the links of the pages
+    it didn't rebuild, against the routes of this build. Each check is a
+    dict lookup; the output directory is never read.
+    """
+
+    def __init__(self, path, routes, pages=None):
+        self.path = path
+        self.routes = routes
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, path, routes):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return cls(path, routes)
+        if data.get("version") != REPORT_VERSION:
+            return cls(path, routes)
+        return cls(path, routes, data["pages"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({"version": REPORT_VERSION, "pages": self.pages}, f)
+
+    def add_page(self, source, dest_path, links):
+        page_path = self.routes.rel_path(dest_path)
+        self.pages[source] = [page_path, links.urls, sorted(links.anchors)]
+
+    def retain(self, sources):
+        sources = set(sources)
+        for source in list(self.pages):
+            if source not in sources:
+                del self.pages[source]
+
+    def dead_links(self):
+        """Sorted (source, url, reason) of every link that leads nowhere."""
+        anchors = {
+            page_path: set(page_anchors)
+            for page_path, _, page_anchors in self.pages.values()
+        }
+        dead = []
+        for source, (page_path, urls, _) in self.pages.items():
+            for url in urls:
+                reason = self.check(page_path, url, anchors)
+                if reason is not None:
+                    dead.append((source, url, reason))
+        return sorted(dead)
+
+    def check(self, page_path, url, anchors):
+        if EXTERNAL_URL.match(url):
+            return None
+        parts = urlsplit(url)
+        target = page_path
+        if parts.path != "":
+            page_dir = posixpath.dirname("/" + page_path)
+            target_url = posixpath.normpath(posixpath.join(page_dir, parts.path))
+            if parts.path.endswith("/") and target_url != "/":
+                target_url += "/"
+            target = self.routes.resolve(target_url)
+            if target is None:
+                return "no such page or file"
+        fragment = unquote(parts.fragment)
+        # Only pages have anchors; other files' fragments aren't checked.
+        if fragment != "" and target in anchors and fragment not in anchors[target]:
+            return f"no heading #{fragment}"
+        return None
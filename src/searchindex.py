@@ -0,0 +1,131 @@
+import json
+import os
+import re
+
+from manifest import atomic_write
+
+
+INDEX_VERSION = 1
+PREFIX_LENGTH = 2
+TERM_PATTERN = re.compile(r"\w+")
+
+
+class PageTerms:
+    """Term weights of one page, collected from its TextNodes as it renders."""
+
+    def __init__(self):
+        self.title = None
+        self.counts = {}
+
+    def add_nodes(self, text_nodes):
+        counts = self.counts
+        for text_node in text_nodes:
+            for term in TERM_PATTERN.findall(text_node.text.lower()):
+                if len(term) > 1:
+                    counts[term] = counts.get(term, 0) + 1
+
+    def update(self, counts):
+        for term, count in counts.items():
+            self.counts[term] = self.counts.get(term, 0) + count
+
+
+class SearchIndex:
+    """Terms of every page of the site, persisted between builds.
+
+    `pages` maps each source path to [url, title, {term: weight}], so an
+    incremental build only re-collects the pages it rebuilds. write()
+    inverts it into the files the browser loads, under <dest>/search/:
+
+    - index.json: {"version", "prefix_length", "pages": [[url, title], ...],
+      "shards": [name, ...]}; a page's ID is its position in "pages".
+    - <shard>.json, one per distinct term prefix (the first prefix_length
+      characters): {term: [id, weight, id, weight, ...]}, with IDs
+      ascending and each stored as the difference from the previous one.
+      Shard names are the prefix with any character other than an ASCII
+      letter or digit written as _<hex code point>.
+    """
+
+    def __init__(self, path, pages=None):
+        self.path = path
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return cls(path)
+        if data.get("version") != INDEX_VERSION:
+            return cls(path)
+        return cls(path, data["pages"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({"version": INDEX_VERSION, "pages": self.pages}, f)
+
+    def add_page(self, source, url, terms):
+        self.pages[source] = [url, terms.title, terms.counts]
+
+    def retain(self, sources):
+        sources = set(sources)
+        for source in list(self.pages):
+            if source not in sources:
+                del self.pages[source]
+
+    def write(self, dest_dir_path, prefix_length=PREFIX_LENGTH):
+        search_dir = os.path.join(dest_dir_path, "search")
+        os.makedirs(search_dir, exist_ok=True)
+        pages = sorted(self.pages.values(), key=lambda page: page[0])
+        shards = {}
+        for page_id, (_, _, counts) in enumerate(pages):
+            for term, weight in counts.items():
+                shard = shards.setdefault(shard_name(term[:prefix_length]), {})
+                shard.setdefault(term, []).append((page_id, weight))
+
+        written = set()
+        for name, terms in shards.items():
+            encoded = {}
+            for term, postings in terms.items():
+                flat = []
+                previous = 0
+                for page_id, weight in postings:
+                    flat.append(page_id - previous)
+                    flat.append(weight)
+                    previous = page_id
+                encoded[term] = flat
+            _write_json(os.path.join(search_dir, name + ".json"), encoded)
+            written.add(name + ".json")
+        index = {
+            "version": INDEX_VERSION,
+            "prefix_length": prefix_length,
+            "pages": [[url, title] for url, title, _ in pages],
+            "shards": sorted(shards),
+        }
+        _write_json(os.path.join(search_dir, "index.json"), index)
+        written.add("index.json")
+
+        for filename in os.listdir(search_dir):
+            if filename.endswith(".json") and filename not in written:
+                os.remove(os.path.join(search_dir, filename))
+        return sorted(written)
+
+
+def shard_name(prefix):
+    return "".join(
+        char if char.isascii() and char.isalnum() else f"_{ord(char):x}"
+        for char in prefix
+    )
+
+
+def page_url(dest_dir_path, dest_path, basepath):
+    rel_path = os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    if rel_path == "index.html" or rel_path.endswith("/index.html"):
+        rel_path = rel_path[: -len("index.html")]
+    return basepath + rel_path
+
+
+def _write_json(path, data):
+    with atomic_write(path) as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False, sort_keys=True)
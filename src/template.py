@@ -0,0 +1,77 @@
+import re
+
+from minify import minify_html
+
+
+SLOT_PATTERN = re.compile(r"\{\{ (Title|Content) \}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r'((?:href|src)=")(/[^"]*)"')
+
+
+class CompiledTemplate:
+    """template.html split into static text and named slots.
+
+    `parts` alternates static segments (even indexes) and slot names (odd
+    indexes). The basepath rewrite of the template's own URLs is done once
+    here, so rendering a page is a single join over the parts.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.slots = {}
+        for i in range(1, len(parts), 2):
+            self.slots.setdefault(parts[i], []).append(i)
+
+    def render(self, **values):
+        parts = list(self.parts)
+        for name, indexes in self.slots.items():
+            value = values[name]
+            for i in indexes:
+                parts[i] = value
+        return "".join(parts)
+
+    def write(self, fp, **values):
+        """Stream the page into `fp`.
+
+        Slot values are either strings or iterables of string chunks, such
+        as `HTMLNode.iter_html()`, which are written as they are produced.
+        """
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                fp.write(part)
+                continue
+            value = values[part]
+            if isinstance(value, str):
+                fp.write(value)
+                continue
+            if len(self.slots[part]) > 1:
+                value = values[part] = "".join(value)
+                fp.write(value)
+                continue
+            for chunk in value:
+                fp.write(chunk)
+
+
+def compile_template(template, basepath, assets=None, minify=False):
+    # Slot markers hold no URLs, so the whole text is rewritten at once. It
+    # is minified as a whole as well (after the rewrite, which looks for
+    # quoted attributes), so a slot inside <pre> stays in raw text.
+    template = rewrite_urls(template, basepath, assets)
+    if minify:
+        template = minify_html(template)
+    return CompiledTemplate(SLOT_PATTERN.split(template))
+
+
+def load_template(template_path, basepath, assets=None, minify=False):
+    with open(template_path, "r") as f:
+        return compile_template(f.read(), basepath, assets, minify)
+
+
+def rewrite_urls(html, basepath, assets=None):
+    if assets is not None:
+        html = URL_ATTRIBUTE_PATTERN.sub(
+            lambda m: f'{m.group(1)}{assets.resolve(m.group(2))}"', html
+        )
+    if basepath == "/":
+        return html
+    html = html.replace('href="/', 'href="' + basepath)
+    return html.replace('src="/', 'src="' + basepath)
@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from assets import build_asset_map, publish_assets
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+from rendercontext import RenderContext
+from template import compile_template
+
+
+class TestAssets(TempDirTestCase):
+    write_dir = "static"
+
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        self.write("logo.png", b"png bytes")
+        self.write("images/logo.png", b"png bytes")
+        self.write("images/other.png", b"other bytes")
+        self.write("css/site.css", b'a { background: url("../images/logo.png?v=1"); }')
+        self.write(".gitignore", b"public/\n")
+
+    def test_identical_files_share_one_name(self):
+        assets = build_asset_map(self.static)
+        self.assertEqual(assets.urls["/logo.png"], assets.urls["/images/logo.png"])
+        self.assertRegex(assets.urls["/logo.png"], r"^/images/logo\.[0-9a-f]{8}\.png$")
+        self.assertNotEqual(assets.urls["/images/other.png"], assets.urls["/logo.png"])
+        self.assertNotIn("/.gitignore", assets.urls)
+
+    def test_css_references_are_rewritten(self):
+        assets = build_asset_map(self.static)
+        css = assets.files[assets.urls["/css/site.css"][1:]].decode("utf-8")
+        logo = os.path.basename(assets.urls["/logo.png"])
+        self.assertEqual(css, f'a {{ background: url("../images/{logo}?v=1"); }}')
+
+    def test_css_name_follows_referenced_image(self):
+        before = build_asset_map(self.static).urls["/css/site.css"]
+        self.write("images/logo.png", b"new png bytes")
+        self.assertNotEqual(build_asset_map(self.static).urls["/css/site.css"], before)
+
+    def test_publish_writes_each_file_once(self):
+        assets = build_asset_map(self.static)
+        written = publish_assets(assets, self.dest, quiet=True)
+        self.assertEqual(len(written), 4)
+        self.assertEqual(publish_assets(assets, self.dest, quiet=True), [])
+        self.assertTrue(os.path.isfile(os.path.join(self.dest, ".gitignore")))
+
+    def test_recompression_setting_republishes_pngs(self):
+        assets = build_asset_map(self.static)
+        manifest_path = os.path.join(self.root, ".build", "manifest.json")
+
+        def publish(recompress_pngs):
+            manifest = BuildManifest.load(manifest_path)
+            written = publish_assets(
+                assets, self.dest, manifest, quiet=True, recompress_pngs=recompress_pngs
+            )
+            manifest.save()
+            return sorted(os.path.splitext(path)[1] for path in written)
+
+        self.assertEqual(len(publish(False)), 4)
+        self.assertEqual(publish(True), [".png", ".png"])
+        self.assertEqual(publish(True), [])
+        self.assertEqual(publish(False), [".png", ".png"])
+
+    def test_references_resolve_through_map(self):
+        assets = build_asset_map(self.static)
+        logo = assets.urls["/logo.png"]
+        context = RenderContext("/site/", assets=assets)
+        self.assertEqual(context.resolve_url("/logo.png#top"), f"/site{logo}#top")
+        self.assertEqual(context.resolve_url("/missing.png"), "/site/missing.png")
+        template = compile_template('<img src="/images/logo.png">{{ Content }}', "/", assets)
+        self.assertEqual(template.parts[0], f'<img src="{logo}">')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import gzip
+import os
+import subprocess
+import sys
+import unittest
+
+from compress import gzip_variant, read_source_tag, should_compress
+from copystatic import sync_files
+from fixtures import TempDirTestCase
+from manifest import hash_file
+
+
+class TestGzipVariant(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, "index.html")
+        self.write(self.path, b"<p>hello</p>" * 100)
+
+    def read_gz(self, path):
+        with gzip.open(path + ".gz", "rb") as f:
+            return f.read()
+
+    def test_roundtrip(self):
+        self.assertTrue(gzip_variant(self.path, 6))
+        with open(self.path, "rb") as f:
+            self.assertEqual(self.read_gz(self.path), f.read())
+        digest, level = read_source_tag(self.path + ".gz")
+        self.assertEqual((digest.decode("ascii"), level), (hash_file(self.path), 6))
+
+    def test_unchanged_source_is_skipped(self):
+        self.assertTrue(gzip_variant(self.path))
+        self.assertFalse(gzip_variant(self.path))
+        # Another level makes another variant.
+        self.assertTrue(gzip_variant(self.path, 1))
+        self.assertFalse(gzip_variant(self.path, 1))
+        self.write(self.path, b"<p>changed</p>")
+        self.assertTrue(gzip_variant(self.path))
+        self.assertEqual(self.read_gz(self.path), b"<p>changed</p>")
+
+    def test_compressed_formats_are_skipped(self):
+        self.assertFalse(should_compress("images/tolkien.PNG"))
+        self.assertFalse(should_compress("docs/.gitignore"))
+        self.assertTrue(should_compress("index.css"))
+        png = os.path.join(self.root, "a.png")
+        self.write(png, b"\x89PNG")
+        self.assertFalse(gzip_variant(png))
+        self.assertFalse(os.path.exists(png + ".gz"))
+
+    def test_sync_files_compresses_copies(self):
+        source = os.path.join(self.root, "static")
+        dest = os.path.join(self.root, "docs")
+        self.write(os.path.join(source, "index.css"), b"body { margin: 0; }")
+        self.write(os.path.join(source, "images", "a.png"), b"\x89PNG")
+        sync_files(source, dest, quiet=True, gzip_level=9)
+        self.assertEqual(
+            self.read_gz(os.path.join(dest, "index.css")), b"body { margin: 0; }"
+        )
+        self.assertFalse(os.path.exists(os.path.join(dest, "images", "a.png.gz")))
+        os.remove(os.path.join(dest, "index.css.gz"))
+        self.assertEqual(sync_files(source, dest, quiet=True, gzip_level=9), [])
+        self.assertTrue(os.path.exists(os.path.join(dest, "index.css.gz")))
+
+    def test_incremental_build_follows_gzip_flag(self):
+        root = self.root
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(root, "static", "index.css"), b"body { margin: 0 }")
+        self.write(os.path.join(root, "content", "index.md"), b"# Home\n\nhi")
+        main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+        def build(*args):
+            subprocess.run(
+                [sys.executable, main, "/", "--quiet", "--incremental", *args],
+                cwd=root,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            docs = os.path.join(root, "docs")
+            return sorted(
+                name
+                for _, _, names in os.walk(docs)
+                for name in names
+                if name.endswith(".gz")
+            )
+
+        self.assertEqual(build(), [])
+        self.assertEqual(build("--gzip", "5"), ["index.css.gz", "index.html.gz"])
+        self.assertEqual(build("--gzip", "1"), ["index.css.gz", "index.html.gz"])
+        for name in ("index.css", "index.html"):
+            tag = read_source_tag(os.path.join(root, "docs", name + ".gz"))
+            self.assertEqual(tag[1], 1, name)
+        self.assertEqual(build(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from copystatic import sync_files
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+
+
+class TestSyncFiles(TempDirTestCase):
+    write_dir = "static"
+
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.write("index.css", "body {}")
+        self.write("images/a.png", "png bytes")
+
+    def read(self, rel_path):
+        with open(os.path.join(self.docs, rel_path)) as f:
+            return f.read()
+
+    def test_copies_everything_then_nothing(self):
+        copied = sync_files(self.static, self.docs)
+        self.assertEqual(len(copied), 2)
+        self.assertEqual(self.read("images/a.png"), "png bytes")
+        self.assertEqual(sync_files(self.static, self.docs), [])
+
+    def test_copies_changed_file(self):
+        sync_files(self.static, self.docs)
+        path = self.write("index.css", "body { margin: 0 }")
+        copied = sync_files(self.static, self.docs)
+        self.assertEqual(copied, [(path, os.path.join(self.docs, "index.css"))])
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_checksum_skips_touched_file(self):
+        sync_files(self.static, self.docs)
+        path = os.path.join(self.static, "index.css")
+        os.utime(path, ns=(0, 10**18))
+        self.assertEqual(sync_files(self.static, self.docs, checksum=True), [])
+        self.assertEqual(len(sync_files(self.static, self.docs)), 0)
+
+    def test_hardlink(self):
+        sync_files(self.static, self.docs, hardlink=True)
+        dest = os.path.join(self.docs, "index.css")
+        self.assertTrue(os.path.samefile(dest, os.path.join(self.static, "index.css")))
+
+    def test_removed_source_is_removed_from_output(self):
+        manifest_path = os.path.join(self.root, "manifest.json")
+        manifest = BuildManifest.load(manifest_path)
+        sync_files(self.static, self.docs, manifest)
+        manifest.save()
+
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        manifest = BuildManifest.load(manifest_path)
+        sync_files(self.static, self.docs, manifest)
+        manifest.remove_stale_outputs(self.docs)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import socket
+import threading
+import time
+import unittest
+
+from client import request
+from daemon import BuildDaemon, serve
+from fixtures import TempDirTestCase
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+class TestBuildDaemon(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self.write(
+            "template.html", "<title>{{ Title }}</title>{{ Content }}"
+        )
+        self.write("content/index.md", "# Home\n\nhello")
+        self.write("content/blog/index.md", "# Blog\n\nposts")
+        self.write("static/index.css", "body {}")
+        self.daemon = BuildDaemon(
+            os.path.join(self.root, "content"),
+            os.path.join(self.root, "static"),
+            self.template,
+            os.path.join(self.root, "docs"),
+            "/",
+        )
+
+    def write(self, rel_path, text):
+        path = super().write(rel_path, text)
+        # A later mtime, even on filesystems with coarse timestamps.
+        os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+        return path
+
+    def read(self, rel_path):
+        with open(os.path.join(self.root, rel_path)) as f:
+            return f.read()
+
+    def test_rebuild_changed(self):
+        self.assertEqual(self.daemon.rebuild(), 0)
+        self.write("content/index.md", "# Home\n\nchanged")
+        self.assertEqual(self.daemon.rebuild(), 1)
+        self.assertIn("<p>changed</p>", self.read("docs/index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs", "blog")))
+        self.assertEqual(self.daemon.rebuild(), 0)
+
+    def test_rebuild_paths(self):
+        self.write("content/blog/index.md", "# Blog\n\nnew post")
+        path = os.path.join(self.root, "content", "blog", "index.md")
+        self.assertEqual(self.daemon.rebuild([path]), 1)
+        self.assertIn("<p>new post</p>", self.read("docs/blog/index.html"))
+        # The snapshot took the change in, so a scan finds nothing new.
+        self.assertEqual(self.daemon.rebuild(), 0)
+
+    def test_rebuild_directory_forgets_deleted_files(self):
+        os.remove(os.path.join(self.root, "content", "blog", "index.md"))
+        blog = os.path.join(self.root, "content", "blog")
+        self.assertEqual(self.daemon.rebuild([blog]), 1)
+        self.assertEqual(self.daemon.rebuild(), 0)
+
+    def test_template_change_rebuilds_every_page(self):
+        with open(self.template, "w") as f:
+            f.write("<h6>{{ Title }}</h6>{{ Content }}")
+        os.utime(self.template, ns=(time.time_ns() + 10**9,) * 2)
+        self.daemon.rebuild()
+        self.assertIn("<h6>Home</h6>", self.read("docs/index.html"))
+        self.assertIn("<h6>Blog</h6>", self.read("docs/blog/index.html"))
+
+    def test_socket_requests(self):
+        socket_path = os.path.join(self.root, "daemon.sock")
+        thread = threading.Thread(target=serve, args=(self.daemon, socket_path))
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.01)
+            render = {"command": "render", "markdown": "# A\n\nb"}
+            self.assertEqual(
+                request(socket_path, render)["html"],
+                '<title>A</title><div><h1 id="a">A</h1><p>b</p></div>',
+            )
+            response = request(socket_path, {"command": "render", "markdown": "b"})
+            self.assertFalse(response["ok"])
+            self.assertEqual(response["error"], "no title found")
+            response = request(socket_path, {"command": "rebuild"})
+            self.assertTrue(response["ok"])
+            self.assertIn("Rebuilt 0 changed file(s)", response["output"])
+        finally:
+            request(socket_path, {"command": "stop"})
+            thread.join()
+        self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from fragmentcache import ENTRY_OVERHEAD, FragmentCache, FragmentStats
+from markdown_blocks import BlockType, markdown_to_html_node
+from rendercontext import RenderContext
+
+
+FOOTER = "## Contact\n\nWrite to [me](/contact) about **anything**."
+
+
+class TestFragmentCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = FragmentCache(3 * (ENTRY_OVERHEAD + len("<p>")))
+        keys = [cache.key("/", BlockType.PARAGRAPH, [str(i)]) for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, "<p>")
+        self.assertEqual(cache.get(keys[0]), ("<p>", None))
+        cache.put(keys[3], "<p>")
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[0]), ("<p>", None))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_repeated_blocks_across_pages(self):
+        cache = FragmentCache(1 << 20)
+        pages = ["# One\n\n" + FOOTER, "# Two\n\n" + FOOTER]
+        for page in pages:
+            expected = markdown_to_html_node(page, RenderContext("/site/")).to_html()
+            context = RenderContext("/site/", fragments=cache)
+            self.assertEqual(markdown_to_html_node(page, context).to_html(), expected)
+        # Headings aren't cached, so only the paragraph is shared.
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_repeated_headings_stay_unique(self):
+        cache = FragmentCache(1 << 20)
+        page = "# One\n\n" + FOOTER + "\n\n" + FOOTER
+        expected = markdown_to_html_node(page).to_html()
+        context = RenderContext(fragments=cache)
+        self.assertEqual(markdown_to_html_node(page, context).to_html(), expected)
+        self.assertIn('id="contact-1"', expected)
+
+    def test_key_includes_context(self):
+        cache = FragmentCache(1 << 20)
+        markdown_to_html_node(FOOTER, RenderContext("/a/", fragments=cache))
+        html = markdown_to_html_node(FOOTER, RenderContext("/b/", fragments=cache))
+        self.assertIn('href="/b/contact"', html.to_html())
+        self.assertEqual(cache.hits, 0)
+
+    def test_stats_summary(self):
+        stats = FragmentStats()
+        stats.add(3, 1)
+        stats.add(0, 4)
+        self.assertEqual(
+            stats.summary(), "Block fragment cache: 3 hits, 5 misses (37.5% hit rate)"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,21 @@
+import os
+import threading
 import unittest
+from unittest import mock
 
-from gencontent import extract_title
+import gencontent
+from fixtures import TempDirTestCase
+from gencontent import (
+    PageBuildError,
+    discover_pages,
+    extract_title,
+    generate_pages_recursive,
+)
+from manifest import BuildManifest
+from parsecache import ParseCache
+from profiler import STAGES, BuildProfile
+from routes import LinkReport, RouteIndex
+from searchindex import SearchIndex
 
 
 class TestExtractTitle(unittest.TestCase):
@@ -46,5 +61,207 @@ no title
             pass
 
 
+class TestGeneratePages(TempDirTestCase):
+    write_dir = "content"
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as f:
+            f.write('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+        self.write("index.md", "# Home\n\n[about](/about)")
+        self.write("blog/post/index.md", "# Post\n\n" + "some **text**\n\n" * 50)
+        self.write("about/index.md", "# About\n\n![me](/me.png)")
+
+    def test_discover_pages(self):
+        dest = os.path.join(self.root, "docs")
+        pages = sorted(str(page[1]) for page in discover_pages(self.content, dest))
+        self.assertEqual(
+            pages,
+            [
+                os.path.join(dest, "about", "index.html"),
+                os.path.join(dest, "blog", "post", "index.html"),
+                os.path.join(dest, "index.html"),
+            ],
+        )
+
+    def test_parallel_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/base/")
+        generate_pages_recursive(
+            self.content, self.template, parallel, "/base/", jobs=2
+        )
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_profiled_matches_plain(self):
+        plain = os.path.join(self.root, "plain")
+        profiled = os.path.join(self.root, "profiled")
+        profiler = BuildProfile()
+        generate_pages_recursive(self.content, self.template, plain, "/base/")
+        generate_pages_recursive(
+            self.content, self.template, profiled, "/base/", quiet=True, profiler=profiler
+        )
+        self.assertEqual(self.read_tree(plain), self.read_tree(profiled))
+        self.assertEqual(len(profiler.pages), 3)
+        for page in profiler.pages:
+            self.assertEqual(set(page.seconds), set(STAGES))
+            self.assertGreater(page.seconds["html_tree"], 0)
+        trace = os.path.join(self.root, "trace.json")
+        profiler.write_trace(trace)
+        self.assertTrue(os.path.getsize(trace) > 0)
+
+    def test_parse_cache_matches_plain(self):
+        plain = os.path.join(self.root, "plain")
+        cached = os.path.join(self.root, "cached")
+        cache = ParseCache(os.path.join(self.root, "parse-cache"))
+        generate_pages_recursive(self.content, self.template, plain, "/base/")
+        for _ in range(2):
+            generate_pages_recursive(
+                self.content, self.template, cached, "/base/", quiet=True, cache=cache
+            )
+            self.assertEqual(self.read_tree(plain), self.read_tree(cached))
+        self.assertEqual(len(self.read_tree(cache.path)), 3)
+
+    def test_async_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        generate_pages_recursive(self.content, self.template, serial, "/base/")
+        for jobs in (1, 2):
+            dest = os.path.join(self.root, f"async{jobs}")
+            generate_pages_recursive(
+                self.content, self.template, dest, "/base/", jobs=jobs, max_open=2
+            )
+            self.assertEqual(self.read_tree(serial), self.read_tree(dest))
+
+    def test_async_caps_pages_in_flight(self):
+        for i in range(10):
+            self.write(f"extra{i}/index.md", f"# Extra {i}")
+        lock = threading.Lock()
+        in_flight = [0, 0]
+        read_source = gencontent._read_source
+        write_page = gencontent._write_page
+
+        def counting_read(from_path):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            return read_source(from_path)
+
+        def counting_write(dest_path, page):
+            write_page(dest_path, page)
+            with lock:
+                in_flight[0] -= 1
+
+        dest = os.path.join(self.root, "docs")
+        with mock.patch.object(gencontent, "_read_source", counting_read):
+            with mock.patch.object(gencontent, "_write_page", counting_write):
+                generate_pages_recursive(
+                    self.content, self.template, dest, "/", quiet=True, max_open=3
+                )
+        self.assertEqual(len(self.read_tree(dest)), 13)
+        self.assertLessEqual(in_flight[1], 3)
+
+    def test_async_error_names_page(self):
+        self.write("broken/index.md", "# Broken\n\nthis is **not closed")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(PageBuildError) as cm:
+            generate_pages_recursive(
+                self.content, self.template, dest, "/", quiet=True, max_open=2
+            )
+        self.assertIn(os.path.join("broken", "index.md"), str(cm.exception))
+
+    def test_streamed_matches_plain(self):
+        self.write("code/index.md", "intro\n\n# Code\n\n```\nx\n\ny\n```\n\n> q\n")
+        plain = os.path.join(self.root, "plain")
+        streamed = os.path.join(self.root, "streamed")
+        generate_pages_recursive(self.content, self.template, plain, "/base/")
+        generate_pages_recursive(
+            self.content, self.template, streamed, "/base/", stream_above=0
+        )
+        self.assertEqual(self.read_tree(plain), self.read_tree(streamed))
+
+    def test_streamed_without_title(self):
+        self.write("untitled/index.md", "no title\n\n## only a subheading")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(PageBuildError) as cm:
+            generate_pages_recursive(self.content, self.template, dest, "/", stream_above=0)
+        self.assertIn("no title found", str(cm.exception))
+
+    def test_indexes_same_in_every_mode(self):
+        self.write("index.md", "# Home\n\n[about](/about) [gone](/gone#x)")
+        expected = None
+        modes = [
+            {},
+            {"jobs": 2},
+            {"max_open": 2},
+            {"stream_above": 0},
+            {"fragment_cache_size": 1 << 20},
+            {"cache": ParseCache(os.path.join(self.root, "parse-cache"))},
+        ]
+        for i, mode in enumerate(modes):
+            dest = os.path.join(self.root, f"docs{i}")
+            index = SearchIndex(os.path.join(self.root, "index.json"))
+            report = LinkReport(os.path.join(self.root, "links.json"), RouteIndex(dest))
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                dest,
+                "/base/",
+                search_index=index,
+                link_report=report,
+                **mode,
+            )
+            if expected is None:
+                expected = index.pages
+            self.assertEqual(index.pages, expected, mode)
+            dead = [(url, reason) for _, url, reason in report.dead_links()]
+            missing = "no such page or file"
+            self.assertEqual(dead, [("/me.png", missing), ("/gone#x", missing)], mode)
+        post = expected[os.path.join(self.content, "blog", "post", "index.md")]
+        self.assertEqual(
+            post, ["/base/blog/post/", "Post", {"post": 1, "some": 50, "text": 50}]
+        )
+
+    def test_incremental_search_index(self):
+        manifest_path = os.path.join(self.root, "manifest.json")
+        index_path = os.path.join(self.root, "index.json")
+        dest = os.path.join(self.root, "docs")
+
+        def build(search_index=None):
+            manifest = BuildManifest.load(manifest_path)
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                dest,
+                "/",
+                manifest=manifest,
+                quiet=True,
+                search_index=search_index,
+            )
+            manifest.save()
+
+        build()
+        # Pages built before indexing was turned on are rebuilt for it.
+        index = SearchIndex(index_path)
+        build(index)
+        index.save()
+        self.assertEqual(len(index.pages), 3)
+        os.remove(os.path.join(self.content, "about", "index.md"))
+        self.write("index.md", "# Home\n\nnew words")
+        index = SearchIndex.load(index_path)
+        build(index)
+        self.assertEqual(len(index.pages), 2)
+        home = index.pages[os.path.join(self.content, "index.md")]
+        self.assertEqual(home[2], {"home": 1, "new": 1, "words": 1})
+
+    def test_parallel_error_names_page(self):
+        self.write("broken/index.md", "# Broken\n\nthis is **not closed")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(PageBuildError) as cm:
+            generate_pages_recursive(self.content, self.template, dest, "/", jobs=2)
+        self.assertIn(os.path.join("broken", "index.md"), str(cm.exception))
+
+
 if __name__ == "__main__":
     unittest.main()
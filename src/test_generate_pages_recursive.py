@@ -0,0 +1,84 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from imagemeta import ImageIndex
+
+try:
+    import generate_pages_recursive as jinja_backend
+except ImportError:
+    jinja_backend = None
+
+
+@unittest.skipIf(jinja_backend is None, "jinja2 and markdown are not installed")
+class TestJinjaBackend(TempDirTestCase):
+    write_dir = "content"
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        self.cache = os.path.join(self.root, ".build", "jinja-cache")
+        with open(self.template, "w") as f:
+            f.write('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+        self.write("index.md", "title: Home\n\n# Home\n\n[about](/about)")
+        self.write(
+            "blog/post/index.md",
+            "# Post\n\n![map](/images/map.png)\n\n" + "some **text**\n\n" * 50,
+        )
+        self.write("blog/post/photo.jpg", "not really a jpeg")
+
+    def build(self, dest, jobs=1, images=None):
+        jinja_backend.generate_pages_recursive(
+            self.content,
+            self.template,
+            dest,
+            "/base/",
+            jobs,
+            self.cache,
+            quiet=True,
+            images=images,
+        )
+        tree = {}
+        for dir_path, _, filenames in os.walk(dest):
+            for filename in filenames:
+                path = os.path.join(dir_path, filename)
+                with open(path, "rb") as f:
+                    tree[os.path.relpath(path, dest)] = f.read()
+        return tree
+
+    def test_parallel_matches_serial(self):
+        serial = self.build(os.path.join(self.root, "serial"))
+        parallel = self.build(os.path.join(self.root, "parallel"), jobs=2)
+        self.assertEqual(serial, parallel)
+        self.assertIn(b"<title>Home</title>", serial["index.html"])
+        self.assertIn(b'href="/base/index.css"', serial["index.html"])
+        self.assertTrue(os.listdir(self.cache))
+
+    def test_title_and_images_match_native_backend(self):
+        images = ImageIndex({"/images/map.png": (40, 30)})
+        tree = self.build(os.path.join(self.root, "docs"), images=images)
+        post = tree[os.path.join("blog", "post", "index.html")]
+        self.assertIn(b"<title>Post</title>", post)
+        self.assertIn(
+            b'src="/base/images/map.png" width="40" height="30"'
+            b' loading="lazy" decoding="async"',
+            post,
+        )
+
+    def test_unchanged_assets_are_skipped(self):
+        dest = os.path.join(self.root, "docs")
+        self.build(dest)
+        photo = os.path.join(dest, "blog", "post", "photo.jpg")
+        # Same size and mtime as the source, so only a copy would undo it.
+        with open(photo, "w") as f:
+            f.write("NOT really a jpeg")
+        stat = os.stat(os.path.join(self.content, "blog", "post", "photo.jpg"))
+        os.utime(photo, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.build(dest)
+        with open(photo) as f:
+            self.assertEqual(f.read(), "NOT really a jpeg")
+
+
+if __name__ == "__main__":
+    unittest.main()
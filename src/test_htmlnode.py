@@ -1,6 +1,9 @@
+import io
 import unittest
 from htmlnode import HTMLNode
 from htmlnode import LeafNode
+from htmlnode import ParentNode
+from htmlnode import RawHTMLNode
 
 class TestHTMLNode(unittest.TestCase):
     
@@ -82,6 +85,69 @@ class TestHTMLNode(unittest.TestCase):
         node = LeafNode("p", "Hello, world!")
         self.assertEqual(node.to_html(), "<p>Hello, world!</p>")
 
+    def test_parent_to_html_nested(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " text")]),
+                LeafNode("a", "link", {"href": "/x"}),
+            ],
+            {"class": "box"},
+        )
+        self.assertEqual(
+            node.to_html(),
+            '<div class="box"><p><b>Bold</b> text</p><a href="/x">link</a></div>',
+        )
+
+    def test_parent_without_children_raises(self):
+        node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
+    def test_write_html_matches_to_html(self):
+        node = ParentNode(
+            "ul", [ParentNode("li", [LeafNode(None, str(i))]) for i in range(3000)]
+        )
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), node.to_html())
+        self.assertTrue(out.getvalue().startswith("<ul><li>0</li><li>1</li>"))
+
+    def test_props_as_pairs(self):
+        node = LeafNode("img", "", (("src", "/a.png"), ("alt", "a")))
+        self.assertEqual(node.to_html(), '<img src="/a.png" alt="a"></img>')
+        self.assertEqual(node.props, {"src": "/a.png", "alt": "a"})
+
+    def test_nodes_are_slotted(self):
+        for node in (LeafNode("p", "x"), ParentNode("div", []), HTMLNode("p")):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_deep_tree_does_not_recurse(self):
+        node = LeafNode(None, "x")
+        for _ in range(10000):
+            node = ParentNode("div", [node])
+        html = node.to_html()
+        self.assertEqual(html, "<div>" * 10000 + "x" + "</div>" * 10000)
+
+    def test_minified(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode(None, "a  lot\n of   space "), LeafNode("b", "x  y")]),
+                LeafNode("img", "", (("src", "/a.png"), ("alt", "two words"))),
+                ParentNode("pre", [LeafNode("code", "  keep\n    this\n")]),
+                ParentNode("p", [LeafNode("code", "a  b"), RawHTMLNode("<i>  raw</i>")]),
+            ],
+            {"class": "post"},
+        )
+        self.assertEqual(
+            node.to_html(minify=True),
+            '<div class=post><p>a lot of space <b>x y</b></p>'
+            '<img src=/a.png alt="two words">'
+            "<pre><code>  keep\n    this\n</code></pre>"
+            "<p><code>a  b</code><i>  raw</i></p></div>",
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+import json
+import os
+import struct
+import unittest
+import zlib
+
+from copystatic import sync_files
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+from imagemeta import load_image_index, read_image_size, recompress_png
+from rendercontext import RenderContext
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+def png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def make_png(width, height, level=1):
+    rows = b"".join(b"\x00" + bytes(range(width % 256)) * 3 for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + png_chunk(b"IDAT", zlib.compress(rows, level))
+        + png_chunk(b"IEND", b"")
+    )
+
+
+def make_jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class TestImageMeta(TempDirTestCase):
+    write_dir = "static"
+
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.cache_path = os.path.join(self.root, ".build", "images.json")
+
+    def test_read_image_size(self):
+        vp8x = b"VP8X" + struct.pack("<I", 10) + b"\x00" * 4
+        vp8x += (299).to_bytes(3, "little") + (149).to_bytes(3, "little")
+        vp8l = b"VP8L" + struct.pack("<I", 5) + b"\x2f"
+        vp8l += struct.pack("<I", (64 - 1) | ((32 - 1) << 14))
+        cases = {
+            "a.png": (make_png(40, 30), (40, 30)),
+            "a.gif": (b"GIF89a" + struct.pack("<HH", 17, 9) + b"\x00" * 8, (17, 9)),
+            "a.jpg": (make_jpeg(640, 480), (640, 480)),
+            "x.webp": (b"RIFF\x00\x00\x00\x00WEBP" + vp8x, (300, 150)),
+            "l.webp": (b"RIFF\x00\x00\x00\x00WEBP" + vp8l + b"\x00" * 8, (64, 32)),
+            "bad.png": (b"not an image", None),
+        }
+        for name, (data, size) in cases.items():
+            path = self.write(name, data)
+            self.assertEqual(read_image_size(path), size, name)
+
+    def test_index_is_cached_by_stat(self):
+        path = self.write("images/a.png", make_png(40, 30))
+        index = load_image_index(self.static, self.cache_path)
+        self.assertEqual(index.sizes, {"/images/a.png": (40, 30)})
+        with open(self.cache_path) as f:
+            cache = json.load(f)
+        cache["images"]["/images/a.png"][2:] = [1, 2]
+        with open(self.cache_path, "w") as f:
+            json.dump(cache, f)
+        # Same size and mtime: the header isn't read again.
+        cached = load_image_index(self.static, self.cache_path)
+        self.assertEqual(cached.sizes["/images/a.png"], (1, 2))
+        self.assertNotEqual(cached.digest, index.digest)
+        os.utime(path, ns=(0, 0))
+        reread = load_image_index(self.static, self.cache_path)
+        self.assertEqual(reread.sizes["/images/a.png"], (40, 30))
+        self.assertEqual(reread.digest, index.digest)
+
+    def test_img_attributes(self):
+        self.write("images/a.png", make_png(40, 30))
+        index = load_image_index(self.static, self.cache_path)
+        context = RenderContext("/site/", images=index)
+        node = TextNode("alt", TextType.IMAGE, "/images/a.png")
+        self.assertEqual(
+            text_node_to_html_node(node, context).to_html(),
+            '<img src="/site/images/a.png" alt="alt" width="40" height="30"'
+            ' loading="lazy" decoding="async"></img>',
+        )
+        remote = TextNode("alt", TextType.IMAGE, "https://example.com/b.png")
+        self.assertEqual(
+            text_node_to_html_node(remote, context).to_html(),
+            '<img src="https://example.com/b.png" alt="alt"'
+            ' loading="lazy" decoding="async"></img>',
+        )
+
+    def test_recompress_png_is_lossless(self):
+        data = make_png(200, 100, level=1)
+        smaller = recompress_png(data)
+        self.assertLess(len(smaller), len(data))
+        idat = lambda png: zlib.decompress(png[png.index(b"IDAT") + 4 : -16])
+        self.assertEqual(idat(smaller), idat(data))
+        self.assertIsNone(recompress_png(smaller))
+        self.assertIsNone(recompress_png(b"GIF89a"))
+
+    def test_sync_files_recompresses_once(self):
+        self.write("a.png", make_png(200, 100, level=1))
+        dest = os.path.join(self.root, "docs")
+        copied = sync_files(self.static, dest, quiet=True, recompress_pngs=True)
+        self.assertEqual(len(copied), 1)
+        self.assertLess(
+            os.path.getsize(os.path.join(dest, "a.png")),
+            os.path.getsize(os.path.join(self.static, "a.png")),
+        )
+        self.assertEqual(sync_files(self.static, dest, quiet=True, recompress_pngs=True), [])
+
+    def test_recompression_turned_on_over_plain_copies(self):
+        self.write("a.png", make_png(200, 100, level=1))
+        dest = os.path.join(self.root, "docs")
+        manifest_path = os.path.join(self.root, ".build", "manifest.json")
+
+        def sync(recompress_pngs):
+            manifest = BuildManifest.load(manifest_path)
+            copied = sync_files(
+                self.static, dest, manifest, quiet=True, recompress_pngs=recompress_pngs
+            )
+            manifest.save()
+            return len(copied)
+
+        self.assertEqual(sync(False), 1)
+        self.assertEqual(sync(True), 1)
+        self.assertLess(
+            os.path.getsize(os.path.join(dest, "a.png")),
+            os.path.getsize(os.path.join(self.static, "a.png")),
+        )
+        self.assertEqual(sync(True), 0)
+        self.assertEqual(sync(False), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from manifest import BuildManifest, atomic_write, hash_bytes, hash_file
+
+
+class TestBuildManifest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, ".build", "manifest.json")
+        self.dest = os.path.join(self.root, "docs", "index.html")
+        os.makedirs(os.path.dirname(self.dest))
+        with open(self.dest, "w") as f:
+            f.write("<p>hi</p>")
+
+    def build(self, template="t1", pages=None):
+        manifest = BuildManifest.load(self.path)
+        manifest.set_input("template", template)
+        for source, digest in (pages or {}).items():
+            manifest.record("pages", source, digest, self.dest)
+        return manifest
+
+    def test_atomic_write_cleans_up_after_failure(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.dest) as f:
+                f.write("<p>half")
+                raise RuntimeError
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+        with open(self.dest) as f:
+            self.assertEqual(f.read(), "<p>hi</p>")
+
+    def test_hash_file_matches_hash_bytes(self):
+        with open(self.dest, "rb") as f:
+            self.assertEqual(hash_file(self.dest), hash_bytes(f.read()))
+
+    def test_fresh_after_save(self):
+        self.build(pages={"index.md": "h1"}).save()
+        manifest = self.build()
+        self.assertTrue(manifest.is_fresh("pages", "index.md", "h1", self.dest))
+        self.assertFalse(manifest.is_fresh("pages", "index.md", "h2", self.dest))
+        self.assertFalse(manifest.is_fresh("pages", "other.md", "h1", self.dest))
+
+    def test_input_change_invalidates_pages(self):
+        self.build(pages={"index.md": "h1"}).save()
+        manifest = self.build(template="t2")
+        self.assertFalse(manifest.is_fresh("pages", "index.md", "h1", self.dest))
+
+    def test_missing_output_is_not_fresh(self):
+        self.build(pages={"index.md": "h1"}).save()
+        os.remove(self.dest)
+        manifest = self.build()
+        self.assertFalse(manifest.is_fresh("pages", "index.md", "h1", self.dest))
+
+    def test_remove_stale_outputs(self):
+        self.build(pages={"index.md": "h1"}).save()
+        manifest = self.build()
+        removed = manifest.remove_stale_outputs(os.path.join(self.root, "docs"))
+        self.assertEqual(removed, [self.dest])
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_corrupt_manifest_starts_over(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        manifest = BuildManifest.load(self.path)
+        self.assertEqual(manifest.previous["pages"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
+from rendercontext import RenderContext
 from markdown_blocks import (
     markdown_to_html_node,
     markdown_to_blocks,
     block_to_block_type,
+    scan_blocks,
     BlockType,
 )
 
@@ -129,7 +131,17 @@ this is paragraph text
         html = node.to_html()
         self.assertEqual(
             html,
-            "<div><h1>this is an h1</h1><p>this is paragraph text</p><h2>this is an h2</h2></div>",
+            '<div><h1 id="this-is-an-h1">this is an h1</h1><p>this is paragraph text</p>'
+            '<h2 id="this-is-an-h2">this is an h2</h2></div>',
+        )
+
+    def test_repeated_headings_get_unique_ids(self):
+        md = "# Setup\n\n## Usage\n\ntext\n\n## Usage\n\n## Usage 1\n\n## Usage"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><h1 id="setup">Setup</h1><h2 id="usage">Usage</h2><p>text</p>'
+            '<h2 id="usage-1">Usage</h2><h2 id="usage-1-1">Usage 1</h2>'
+            '<h2 id="usage-2">Usage</h2></div>',
         )
 
     def test_blockquote(self):
@@ -163,6 +175,62 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_codeblock_with_blank_lines(self):
+        md = """
+```
+first
+
+second
+```
+
+after
+"""
+
+        node = markdown_to_html_node(md)
+        html = node.to_html()
+        self.assertEqual(
+            html,
+            "<div><pre><code>first\n\nsecond\n</code></pre><p>after</p></div>",
+        )
+
+    def test_basepath_applied_to_links_only(self):
+        md = """
+[home](/index) and ![logo](/logo.png) and [away](https://example.com)
+
+```
+<a href="/literal">
+```
+"""
+
+        node = markdown_to_html_node(md, RenderContext("/site/"))
+        html = node.to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/index">home</a> and '
+            '<img src="/site/logo.png" alt="logo"></img> and '
+            '<a href="https://example.com">away</a></p>'
+            '<pre><code><a href="/literal">\n</code></pre></div>',
+        )
+
+    def test_scan_blocks_records(self):
+        md = "# title\n\nsome\ntext\n\n```\na\n\nb\n```\n- item"
+        records = list(scan_blocks(md))
+        self.assertEqual(
+            records,
+            [
+                (BlockType.HEADING, 0, ["# title"]),
+                (BlockType.PARAGRAPH, 2, ["some", "text"]),
+                (BlockType.CODE, 5, ["```", "a", "", "b", "```"]),
+                (BlockType.ULIST, 10, ["- item"]),
+            ],
+        )
+
+    def test_unclosed_fence_is_plain_text(self):
+        md = "```\nnot code\n\nparagraph"
+        self.assertEqual(
+            markdown_to_blocks(md), ["```\nnot code", "paragraph"]
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from fixtures import TempDirTestCase
+from gencontent import discover_pages, partition_pages
+from merge import MergeError, merge_shards
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestShardedBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("static/index.css", "body { margin: 0 }")
+        self.write("content/index.md", "# Home\n\n[0](/p0#page-0) [css](/index.css)")
+        for i in range(7):
+            self.write(f"content/p{i}/index.md", f"# Page {i}\n\n" + "words " * 40 * i)
+
+    def run_main(self, *args):
+        # A separate process per shard, standing in for a CI machine.
+        return subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, "main.py"), "/", "--quiet", *args],
+            cwd=self.root,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def shard_dirs(self, count):
+        shards = os.path.join(self.root, ".build", "shards")
+        return [os.path.join(shards, str(i)) for i in range(1, count + 1)]
+
+    def test_partition_is_balanced_and_deterministic(self):
+        pages = discover_pages(os.path.join(self.root, "content"), "docs")
+        slices = partition_pages(pages, 3)
+        self.assertEqual(slices, partition_pages(list(reversed(pages)), 3))
+        sharded = [page for part in slices for page in part]
+        self.assertEqual(sorted(sharded), sorted(pages))
+        # Greedy largest-first keeps the slices within one page of each other.
+        sizes = {page: os.path.getsize(page[0]) for page in pages}
+        loads = [sum(sizes[page] for page in part) for part in slices]
+        self.assertLessEqual(max(loads) - min(loads), max(sizes.values()))
+
+    def test_merged_shards_match_full_build(self):
+        flags = ("--search-index", "--check-links", "--gzip")
+        self.assertEqual(self.run_main(*flags).wait(), 0)
+        full = self.read_tree(os.path.join(self.root, "docs"))
+        processes = [self.run_main(*flags, "--shard", f"{i}/3") for i in (1, 2, 3)]
+        self.assertEqual([process.wait() for process in processes], [0, 0, 0])
+        dest = os.path.join(self.root, "merged")
+        link_report = merge_shards(self.shard_dirs(3), dest, quiet=True)
+        self.assertEqual(self.read_tree(dest), full)
+        self.assertEqual(link_report.dead_links(), [])
+
+    def test_merge_rejects_duplicates_and_missing_shards(self):
+        processes = [self.run_main("--shard", f"{i}/2") for i in (1, 2)]
+        self.assertEqual([process.wait() for process in processes], [0, 0])
+        shard_dirs = self.shard_dirs(2)
+        dest = os.path.join(self.root, "merged")
+        with self.assertRaisesRegex(MergeError, "expected shards"):
+            merge_shards(shard_dirs[:1], dest)
+
+        manifest_path = os.path.join(shard_dirs[1], "manifest.json")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["outputs"].append("index.css")
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        with self.assertRaisesRegex(MergeError, "produced twice: index.css"):
+            merge_shards(shard_dirs, dest)
+        self.assertFalse(os.path.exists(dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
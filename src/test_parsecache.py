@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from parsecache import (
+    ENTRY_OVERHEAD,
+    PAGE_MODULES,
+    PARSER_MODULES,
+    MemoryParseCache,
+    ParseCache,
+    generator_version,
+    parser_version,
+)
+
+
+class TestParseCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ParseCache(os.path.join(self.root, "parse-cache"))
+
+    def test_roundtrip(self):
+        key = self.cache.key("# Tolkien\n\nhi", "/")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "Tolkien", "<div><h1>Tolkien</h1><p>hi</p></div>")
+        self.assertEqual(
+            self.cache.get(key),
+            ("Tolkien", "<div><h1>Tolkien</h1><p>hi</p></div>", None),
+        )
+
+    def test_roundtrip_with_record(self):
+        key = self.cache.key("# Tolkien\n\n[hi](/hi)", "/\0search\0links")
+        record = [{"tolkien": 1, "hi": 1}, ["/hi"], ["tolkien"]]
+        self.cache.put(key, "Tolkien", "<div></div>", record)
+        self.assertEqual(self.cache.get(key), ("Tolkien", "<div></div>", record))
+
+    def test_key_depends_on_context(self):
+        self.assertNotEqual(
+            self.cache.key("[a](/b)", "/"), self.cache.key("[a](/b)", "/BP/")
+        )
+        self.assertEqual(self.cache.key("x", "/"), self.cache.key("x", "/"))
+
+    def test_versions_cover_their_modules(self):
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in PARSER_MODULES + PAGE_MODULES:
+            self.assertTrue(os.path.isfile(os.path.join(src_dir, name)), name)
+        self.assertNotEqual(generator_version(), parser_version())
+
+    def test_prune_evicts_least_recently_used(self):
+        keys = [self.cache.key(str(i), "/") for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, "t", "x" * 100)
+            path = self.cache._entry_path(key)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+        self.cache.get(keys[0])
+        entry_size = os.path.getsize(self.cache._entry_path(keys[0]))
+        self.cache.max_bytes = entry_size * 2
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class TestMemoryParseCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryParseCache(2 * (ENTRY_OVERHEAD + len("t") + len("<p>")))
+        keys = [cache.key(str(i), "/") for i in range(3)]
+        cache.put(keys[0], "t", "<p>")
+        cache.put(keys[1], "t", "<p>")
+        self.assertEqual(cache.get(keys[0]), ("t", "<p>", None))
+        cache.put(keys[2], "t", "<p>")
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertEqual(cache.key("x", "/"), ParseCache("unused").key("x", "/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
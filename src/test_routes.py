@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from markdown_blocks import markdown_to_html_node
+from rendercontext import RenderContext
+from routes import LinkReport, PageLinks, RouteIndex
+
+
+class TestRouteIndex(unittest.TestCase):
+    def test_index_pages_are_directories(self):
+        routes = RouteIndex("docs")
+        routes.add(os.path.join("docs", "index.html"))
+        routes.add(os.path.join("docs", "blog", "tom", "index.html"))
+        routes.add(os.path.join("docs", "images", "tom.png"))
+        self.assertEqual(routes.resolve("/"), "index.html")
+        self.assertEqual(routes.resolve("/blog/tom"), "blog/tom/index.html")
+        self.assertEqual(routes.resolve("/blog/tom/"), "blog/tom/index.html")
+        self.assertEqual(routes.resolve("/images/tom.png"), "images/tom.png")
+        self.assertIsNone(routes.resolve("/blog"))
+
+
+class TestLinkReport(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        routes = RouteIndex("docs")
+        for rel_path in ("index.html", "blog/tom/index.html", "a b.png"):
+            routes.add(os.path.join("docs", *rel_path.split("/")))
+        self.report = LinkReport(os.path.join(self.root, "links.json"), routes)
+
+    def add_page(self, source, rel_path, markdown):
+        links = PageLinks()
+        markdown_to_html_node(markdown, RenderContext(links=links))
+        self.report.add_page(source, os.path.join("docs", rel_path), links)
+
+    def test_dead_links(self):
+        self.add_page(
+            "index.md",
+            "index.html",
+            "# Home\n\n[a](/blog/tom#tom) [b](/blog/tom/#nope) [c](#home) "
+            "[d](#away) ![e](/a%20b.png) [f](https://example.com/x) "
+            "[g](mailto:me@example.com) [h](/missing)",
+        )
+        self.add_page("tom.md", "blog/tom/index.html", "# Tom\n\n[i](../../) [j](../x)")
+        self.assertEqual(
+            self.report.dead_links(),
+            [
+                ("index.md", "#away", "no heading #away"),
+                ("index.md", "/blog/tom/#nope", "no heading #nope"),
+                ("index.md", "/missing", "no such page or file"),
+                ("tom.md", "../x", "no such page or file"),
+            ],
+        )
+
+    def test_repeated_headings_are_anchors(self):
+        self.add_page(
+            "index.md",
+            "index.html",
+            "# Home\n\n## Usage\n\n## Usage\n\n[a](#usage-1) [b](#usage-2)",
+        )
+        self.assertEqual(
+            self.report.dead_links(), [("index.md", "#usage-2", "no heading #usage-2")]
+        )
+
+    def test_persisted_pages_are_checked_again(self):
+        self.add_page("index.md", "index.html", "# Home\n\n[tom](/blog/tom)")
+        self.report.save()
+        routes = RouteIndex("docs")
+        routes.add(os.path.join("docs", "index.html"))
+        report = LinkReport.load(self.report.path, routes)
+        self.assertEqual(
+            report.dead_links(), [("index.md", "/blog/tom", "no such page or file")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
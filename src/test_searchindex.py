@@ -0,0 +1,83 @@
+import json
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from inline_markdown import text_to_textnodes
+from searchindex import PageTerms, SearchIndex, page_url, shard_name
+
+
+class TestPageTerms(unittest.TestCase):
+    def test_add_nodes(self):
+        terms = PageTerms()
+        text = "The **Ring** and [the ring](/r) of a `Ring`"
+        terms.add_nodes(text_to_textnodes(text))
+        self.assertEqual(terms.counts, {"the": 2, "ring": 3, "and": 1, "of": 1})
+
+
+class TestSearchIndex(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = SearchIndex(os.path.join(self.root, "index.json"))
+        for source, url, counts in (
+            ("b.md", "/b/", {"ring": 2, "frodo": 1}),
+            ("a.md", "/a/", {"ring": 1, "élan": 1}),
+            ("c.md", "/c/", {"ring": 4}),
+        ):
+            terms = PageTerms()
+            terms.title = source[0].upper()
+            terms.update(counts)
+            self.index.add_page(source, url, terms)
+
+    def read(self, name):
+        with open(os.path.join(self.root, "docs", "search", name)) as f:
+            return json.load(f)
+
+    def test_write_shards(self):
+        dest = os.path.join(self.root, "docs")
+        written = self.index.write(dest)
+        self.assertEqual(written, ["_e9l.json", "fr.json", "index.json", "ri.json"])
+        index = self.read("index.json")
+        self.assertEqual(index["pages"], [["/a/", "A"], ["/b/", "B"], ["/c/", "C"]])
+        self.assertEqual(index["shards"], ["_e9l", "fr", "ri"])
+        # Page IDs are stored as differences from the previous one.
+        self.assertEqual(self.read("ri.json"), {"ring": [0, 1, 1, 2, 1, 4]})
+        self.assertEqual(self.read("fr.json"), {"frodo": [1, 1]})
+
+    def test_write_removes_stale_shards(self):
+        dest = os.path.join(self.root, "docs")
+        self.index.write(dest)
+        self.index.retain(["a.md", "c.md"])
+        self.assertEqual(self.index.write(dest), ["_e9l.json", "index.json", "ri.json"])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(dest, "search"))),
+            ["_e9l.json", "index.json", "ri.json"],
+        )
+        self.assertEqual(self.read("ri.json"), {"ring": [0, 1, 1, 4]})
+
+    def test_save_and_load(self):
+        self.index.save()
+        loaded = SearchIndex.load(self.index.path)
+        self.assertEqual(loaded.pages, self.index.pages)
+        with open(self.index.path, "w") as f:
+            f.write("{broken")
+        self.assertEqual(SearchIndex.load(self.index.path).pages, {})
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("ab"), "ab")
+        self.assertEqual(shard_name("_x"), "_5fx")
+        self.assertEqual(shard_name("日本"), "_65e5_672c")
+
+    def test_page_url(self):
+        self.assertEqual(page_url("docs", os.path.join("docs", "index.html"), "/"), "/")
+        self.assertEqual(
+            page_url("docs", os.path.join("docs", "blog", "index.html"), "/BP/"),
+            "/BP/blog/",
+        )
+        self.assertEqual(
+            page_url("docs", os.path.join("docs", "notes.html"), "/"), "/notes.html"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
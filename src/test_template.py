@@ -0,0 +1,61 @@
+import unittest
+
+from template import compile_template, rewrite_urls
+
+
+class TestCompileTemplate(unittest.TestCase):
+    def test_render(self):
+        template = compile_template(
+            "<title>{{ Title }}</title><body>{{ Content }}</body>", "/"
+        )
+        self.assertEqual(
+            template.render(Title="Home", Content="<p>hi</p>"),
+            "<title>Home</title><body><p>hi</p></body>",
+        )
+
+    def test_basepath_applied_to_template_urls(self):
+        template = compile_template(
+            '<link href="/index.css"><img src="/logo.png">{{ Content }}', "/site/"
+        )
+        self.assertEqual(
+            template.parts[0], '<link href="/site/index.css"><img src="/site/logo.png">'
+        )
+
+    def test_content_slot_text_is_not_substituted(self):
+        template = compile_template("<title>{{ Title }}</title>{{ Content }}", "/")
+        self.assertEqual(
+            template.render(Title="Home", Content="<code>{{ Title }}</code>"),
+            "<title>Home</title><code>{{ Title }}</code>",
+        )
+
+    def test_repeated_slot(self):
+        template = compile_template("{{ Title }}|{{ Title }}|{{ Content }}", "/")
+        self.assertEqual(template.render(Title="t", Content="c"), "t|t|c")
+
+    def test_minify(self):
+        template = compile_template(
+            "<!DOCTYPE html>\n<html>\n<!-- note -->\n<head>\n"
+            '    <link href="/index.css" rel="stylesheet">\n</head>\n'
+            "<body>\n  <pre>  {{ Title }}\n</pre>\n  <span>by</span>  <b>{{ Title }}</b>\n"
+            "  <article>\n    {{ Content }}\n  </article>\n</body>\n</html>\n",
+            "/site/",
+            minify=True,
+        )
+        self.assertEqual(
+            template.parts[0],
+            "<!DOCTYPE html><html><head><link href=/site/index.css rel=stylesheet>"
+            "</head><body><pre>  ",
+        )
+        self.assertEqual(template.parts[2], "\n</pre><span>by</span> <b>")
+        self.assertEqual(template.parts[4], "</b><article>")
+        self.assertEqual(template.parts[6], "</article></body></html>")
+
+    def test_rewrite_urls(self):
+        self.assertEqual(
+            rewrite_urls('<a href="/x">', "/base/"), '<a href="/base/x">'
+        )
+        self.assertEqual(rewrite_urls('<a href="/x">', "/"), '<a href="/x">')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 
+import random
+
 from textnode import TextNode, TextType, text_node_to_html_node, text_to_textnodes, block_to_block_type, BlockType
+from inline_markdown import scan_inline, text_to_textnodes_multipass
 
 
 class TestTextNode(unittest.TestCase):
@@ -190,6 +193,47 @@ class TestTextToTextNodes(unittest.TestCase):
             self.assertEqual(res.text, exp.text)
             self.assertEqual(res.text_type, exp.text_type)
 
+class TestInlineScanner(unittest.TestCase):
+    """scan_inline must produce exactly what the multipass pipeline does."""
+
+    def assertSameNodes(self, text):
+        try:
+            expected = text_to_textnodes_multipass(text)
+        except ValueError:
+            with self.assertRaises(ValueError):
+                scan_inline(text)
+            return
+        self.assertEqual(scan_inline(text), expected, text)
+
+    def test_examples(self):
+        for text in [
+            "This is **text** with an _italic_ word and a `code block` and an "
+            "![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+            "Just some boring text.",
+            "**bold1** and _italic1_ then **bold2** and _italic2_",
+            "",
+            "****",
+            "***",
+            "a **b _c_ d** e",
+            "_a `b` c_ and `d _e_ f`",
+            "[link](https://example.com/a_b_c)",
+            "**[inside bold](/x)** and ![alt](/img.png)[adjacent](/y)",
+            "!![image](/x) and ![broken[link](/y)",
+            "[!](![/u )]()",
+            "unclosed **bold",
+            "unclosed _italic **bold**",
+            "unclosed `code _x_",
+        ]:
+            self.assertSameNodes(text)
+
+    def test_random_inputs(self):
+        tokens = ["a", " ", "**", "*", "_", "`", "![", "[", "](", "(", ")", "]", "!", "/u"]
+        rng = random.Random(5)
+        for _ in range(5000):
+            text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 16)))
+            self.assertSameNodes(text)
+
+
 def test_markdown_to_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -0,0 +1,81 @@
+import gzip
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from watch import LIVE_RELOAD_SCRIPT, changed_paths, load_live_template, rebuild, snapshot
+
+
+class TestWatch(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.template_path = os.path.join(self.root, "template.html")
+        self.write(self.template_path, "<body>{{ Content }}</body>")
+        self.write(os.path.join(self.content, "a.md"), "# A")
+        self.write(os.path.join(self.content, "b.md"), "# B")
+        os.makedirs(self.static)
+
+    def rebuild(self, changed, gzip_level=None):
+        template = load_live_template(self.template_path, "/")
+        rebuild(
+            changed,
+            self.content,
+            self.static,
+            self.template_path,
+            self.docs,
+            "/",
+            template,
+            gzip_level=gzip_level,
+        )
+
+    def test_live_template_injects_script(self):
+        template = load_live_template(self.template_path, "/")
+        page = template.render(Content="x")
+        self.assertEqual(page, "<body>x" + LIVE_RELOAD_SCRIPT + "</body>")
+
+    def test_changed_paths(self):
+        before = snapshot(self.content, self.template_path)
+        self.write(os.path.join(self.content, "c.md"), "# C")
+        os.remove(os.path.join(self.content, "a.md"))
+        after = snapshot(self.content, self.template_path)
+        self.assertEqual(
+            changed_paths(before, after),
+            {os.path.join(self.content, "a.md"), os.path.join(self.content, "c.md")},
+        )
+
+    def test_markdown_change_rebuilds_one_page(self):
+        self.rebuild({os.path.join(self.content, "a.md")})
+        self.assertEqual(sorted(os.listdir(self.docs)), ["a.html"])
+
+    def test_template_change_rebuilds_all_pages(self):
+        self.rebuild({self.template_path})
+        self.assertEqual(sorted(os.listdir(self.docs)), ["a.html", "b.html"])
+
+    def test_deleted_markdown_removes_page(self):
+        self.rebuild({self.template_path})
+        os.remove(os.path.join(self.content, "b.md"))
+        self.rebuild({os.path.join(self.content, "b.md")})
+        self.assertEqual(sorted(os.listdir(self.docs)), ["a.html"])
+
+    def test_gzip_variants_follow_rebuilds(self):
+        css = os.path.join(self.static, "index.css")
+        self.write(css, "body {}")
+        self.rebuild({self.template_path, css}, gzip_level=9)
+        self.assertEqual(
+            sorted(os.listdir(self.docs)),
+            ["a.html", "a.html.gz", "b.html", "b.html.gz", "index.css", "index.css.gz"],
+        )
+        self.write(os.path.join(self.content, "a.md"), "# A changed")
+        self.rebuild({os.path.join(self.content, "a.md")}, gzip_level=9)
+        with gzip.open(os.path.join(self.docs, "a.html.gz"), "rt") as f:
+            self.assertIn("A changed", f.read())
+        os.remove(os.path.join(self.content, "b.md"))
+        self.rebuild({os.path.join(self.content, "b.md")}, gzip_level=9)
+        self.assertNotIn("b.html.gz", os.listdir(self.docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,8 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url = None):
         self.text = text
         self.text_type = text_type
@@ -31,7 +33,7 @@ class TextNode:
     
 
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, context=None):
           
 
     if text_node.text_type == TextType.TEXT:
@@ -49,11 +51,19 @@ def text_node_to_html_node(text_node):
         return LeafNode("code", text_node.text)
     
     elif text_node.text_type == TextType.LINK:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
+        if context is None:
+            return LeafNode("a", text_node.text, (("href", text_node.url),))
+        context.check_link(text_node.url)
+        url = context.resolve_url(text_node.url)
+        return LeafNode("a", text_node.text, (("href", url),))
     
     elif text_node.text_type == TextType.IMAGE:
             
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        if context is None:
+            return LeafNode("img", "", (("src", text_node.url), ("alt", text_node.text)))
+        context.check_link(text_node.url)
+        props = (("src", context.resolve_url(text_node.url)), ("alt", text_node.text))
+        return LeafNode("img", "", props + context.image_attributes(text_node.url))
     
         
     else:
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from compress import remove_variants
+from copystatic import sync_files
+from gencontent import PageBuildError, PageOptions, build_page, discover_pages
+from imagemeta import load_image_index
+from template import compile_template
+
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (
+    "<script>new EventSource(\"" + LIVE_RELOAD_PATH + "\")"
+    ".onmessage = function () { location.reload(); };</script>\n"
+)
+
+
+def load_live_template(template_path, basepath):
+    with open(template_path, "r") as f:
+        template = f.read()
+    index = template.rfind("</body>")
+    if index == -1:
+        template += LIVE_RELOAD_SCRIPT
+    else:
+        template = template[:index] + LIVE_RELOAD_SCRIPT + template[index:]
+    return compile_template(template, basepath)
+
+
+class Reloader:
+    """Build counter that live-reload connections wait on."""
+
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+def make_handler(directory, reloader):
+    class LiveReloadHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def do_GET(self):
+            if self.path != LIVE_RELOAD_PATH:
+                super().do_GET()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            version = reloader.version
+            try:
+                while True:
+                    new_version = reloader.wait(version, 15)
+                    if new_version == version:
+                        self.wfile.write(b": keepalive\n\n")
+                    else:
+                        self.wfile.write(b"data: reload\n\n")
+                        version = new_version
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return LiveReloadHandler
+
+
+def snapshot(*paths):
+    files = {}
+    for path in paths:
+        if os.path.isdir(path):
+            _snapshot_dir(path, files)
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def _snapshot_dir(dir_path, files):
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                _snapshot_dir(entry.path, files)
+            else:
+                stat = entry.stat()
+                files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+
+def changed_paths(old, new):
+    return {path for path in old.keys() | new.keys() if old.get(path) != new.get(path)}
+
+
+def watch(
+    dir_path_content,
+    dir_path_static,
+    template_path,
+    dest_dir_path,
+    basepath,
+    port=8888,
+    interval=0.05,
+    image_cache_path=None,
+    gzip_level=None,
+    checksum=False,
+    hardlink=False,
+    recompress_pngs=False,
+):
+    reloader = Reloader()
+    server = ThreadingHTTPServer(("", port), make_handler(dest_dir_path, reloader))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {dest_dir_path} at http://localhost:{port}/, watching for changes...")
+
+    template = load_live_template(template_path, basepath)
+    images = None
+    if image_cache_path is not None:
+        images = load_image_index(dir_path_static, image_cache_path)
+    state = snapshot(dir_path_content, dir_path_static, template_path)
+    try:
+        while True:
+            time.sleep(interval)
+            new_state = snapshot(dir_path_content, dir_path_static, template_path)
+            changed = changed_paths(state, new_state)
+            if not changed:
+                continue
+            state = new_state
+            start = time.perf_counter()
+            if template_path in changed:
+                template = load_live_template(template_path, basepath)
+            all_pages = False
+            if images is not None and any(
+                _is_within(path, dir_path_static) for path in changed
+            ):
+                new_images = load_image_index(dir_path_static, image_cache_path)
+                all_pages = new_images.digest != images.digest
+                images = new_images
+            rebuild(
+                changed,
+                dir_path_content,
+                dir_path_static,
+                template_path,
+                dest_dir_path,
+                basepath,
+                template,
+                images,
+                all_pages,
+                gzip_level=gzip_level,
+                checksum=checksum,
+                hardlink=hardlink,
+                recompress_pngs=recompress_pngs,
+            )
+            reloader.notify()
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Rebuilt {len(changed)} changed file(s) in {elapsed:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def rebuild(
+    changed,
+    dir_path_content,
+    dir_path_static,
+    template_path,
+    dest_dir_path,
+    basepath,
+    template,
+    images=None,
+    all_pages=False,
+    cache=None,
+    gzip_level=None,
+    checksum=False,
+    hardlink=False,
+    recompress_pngs=False,
+):
+    # A template change affects every page, as does a change to image sizes
+    # (`all_pages`); otherwise each markdown file only affects its own page.
+    if all_pages or template_path in changed:
+        pages = discover_pages(dir_path_content, dest_dir_path)
+    else:
+        pages = []
+        for path in changed:
+            if not _is_within(path, dir_path_content):
+                continue
+            rel_path = os.path.relpath(path, dir_path_content)
+            dest_path = Path(os.path.join(dest_dir_path, rel_path)).with_suffix(".html")
+            if os.path.exists(path):
+                pages.append((path, dest_path))
+            elif os.path.exists(dest_path):
+                os.remove(dest_path)
+                remove_variants([dest_path])
+    options = PageOptions(
+        template_path,
+        basepath,
+        template,
+        cache=cache,
+        gzip_level=gzip_level,
+        images=images,
+    )
+    for from_path, dest_path in pages:
+        try:
+            build_page(from_path, dest_path, options)
+            print(f" * {from_path} -> {dest_path}")
+        except PageBuildError as e:
+            print(f"error: {e}")
+
+    static_changes = [path for path in changed if _is_within(path, dir_path_static)]
+    if static_changes:
+        sync_files(
+            dir_path_static,
+            dest_dir_path,
+            checksum=checksum,
+            hardlink=hardlink,
+            gzip_level=gzip_level,
+            recompress_pngs=recompress_pngs,
+        )
+        for path in static_changes:
+            if os.path.exists(path):
+                continue
+            rel_path = os.path.relpath(path, dir_path_static)
+            dest_path = os.path.join(dest_dir_path, rel_path)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+                remove_variants([dest_path])
+
+
+def _is_within(path, dir_path):
+    return os.path.commonpath(
+        [os.path.abspath(path), os.path.abspath(dir_path)]
+    ) == os.path.abspath(dir_path)